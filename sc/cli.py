@@ -1,4 +1,4 @@
-from argparse import ArgumentParser, Namespace, _ArgumentGroup
+from argparse import ArgumentParser, ArgumentTypeError, Namespace, _ArgumentGroup
 from pathlib import Path
 from sys import stdout
 from typing import Callable, TextIO, Union
@@ -11,6 +11,7 @@ from sc.elf.constants import (
 )
 from sc.ghidra import from_ghidra_xml
 from sc.idb import from_idb
+from sc.idb.idb import ID0Mode
 from sc.simple import to_json, to_txt
 from sc.structures import Bundle
 
@@ -49,6 +50,16 @@ def resolved_nonexistent_or_stdout(string: str) -> Union[Path, TextIO]:
         return resolved_nonexistent(string)
 
 
+def positive_int(string: str) -> int:
+    value: int = int(string)
+
+    # Reported as a usage error, rather than failing later.
+    if value <= 0:
+        raise ArgumentTypeError("Value must be positive.")
+
+    return value
+
+
 def parse_arguments() -> Namespace:
     parser: ArgumentParser = ArgumentParser(
         description="Converts an .idb file to a .sym (ELF) file."
@@ -143,6 +154,38 @@ def parse_arguments() -> Namespace:
         "--verify-checksum", action="store_true", help="Verify IDB section checksums."
     )
 
+    idb_options.add_argument(
+        "--id0-mode",
+        choices=tuple(i.name for i in ID0Mode),
+        help="EAGER decodes the whole ID0 B-tree up front. LAZY decodes pages when they are first needed. FLAT copies all records into a compact sorted index up front. Defaults to EAGER.",
+    )
+
+    idb_options.add_argument(
+        "--page-cache-size",
+        type=positive_int,
+        help="Maximum number of decoded ID0 pages kept in memory in LAZY mode. Defaults to 1024.",
+        metavar="PAGES",
+    )
+
+    idb_options.add_argument(
+        "--memory-map",
+        action="store_true",
+        help="Memory-map the .idb file instead of reading it. Uncompressed sections are then parsed without copying.",
+    )
+
+    idb_options.add_argument(
+        "--threads",
+        type=int,
+        help="Number of threads used to decode IDB sections concurrently. Defaults to 1.",
+        metavar="COUNT",
+    )
+
+    idb_options.add_argument(
+        "--defer-sections",
+        action="store_true",
+        help="Only decompress and parse IDB sections when they are first used.",
+    )
+
     sym_options: _ArgumentGroup = parser.add_argument_group("sym options")
 
     sym_options.add_argument(
@@ -171,6 +214,12 @@ def parse_arguments() -> Namespace:
         help="Include .dynsym sections. This may break GDB loading.",
     )
 
+    sym_options.add_argument(
+        "--merge-string-tails",
+        action="store_true",
+        help="Store names that end other names as part of them, making .strtab smaller.",
+    )
+
     arguments: Namespace = parser.parse_args()
 
     from_count: int = 0
@@ -200,6 +249,9 @@ def parse_arguments() -> Namespace:
     else:
         arguments.big_endian = arguments.endianness == "big"
 
+    if arguments.id0_mode is not None:
+        arguments.id0_mode = ID0Mode[arguments.id0_mode]
+
     if arguments.abi is not None:
         arguments.abi = EIOSABI[f"ELFOSABI_{arguments.abi}"]
 
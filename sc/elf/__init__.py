@@ -1,5 +1,6 @@
 from argparse import Namespace
-from typing import BinaryIO
+from heapq import heappop, heappush
+from typing import BinaryIO, Optional
 
 from sc.elf.constants import (
     EIOSABI,
@@ -11,9 +12,9 @@ from sc.elf.constants import (
     STType,
     STVisibility,
 )
-from sc.elf.elf import BytesSection, ELF, SymbolTableEntry, SymbolTableSection
+from sc.elf.elf import BytesSection, ELF, SymbolTableSection
 from sc.structures import Bundle, Section, SectionFlags, Symbol, SymbolType
-from sc.util import fnn
+from sc.util import IntervalIndex, fnn
 
 # https://refspecs.linuxbase.org/LSB_3.0.0/LSB-PDA/LSB-PDA/specialsections.html
 SECTION_TYPES: dict[bytes, SHType] = {  # Types
@@ -78,6 +79,53 @@ SYMBOL_TYPES: dict[SymbolType, STType] = {
     SymbolType.GLOBAL: STType.STT_OBJECT,
 }
 
+# The binding and type packed as in a symbol table entry.
+SYMBOL_INFOS: dict[SymbolType, int] = {
+    symbol_type: (STBind.STB_LOCAL << 4) | st_type
+    for symbol_type, st_type in SYMBOL_TYPES.items()
+}
+
+
+def section_indices(sections: list[Section]) -> IntervalIndex[int]:
+    """
+    Indexes the position of each section by address. Where sections overlap, the
+    address belongs to the one listed first, so the overlaps are split into pieces
+    that each have a single owner.
+    """
+
+    starts: dict[int, list[int]] = {}
+    boundaries: set[int] = set()
+
+    index: int
+    section: Section
+    for index, section in enumerate(sections):
+        if section.start < section.end:
+            starts.setdefault(section.start, []).append(index)
+            boundaries.update((section.start, section.end))
+
+    pieces: list[tuple[int, int, int]] = []
+    active: list[tuple[int, int]] = []  # A heap of the index and end of each section.
+    ordered: list[int] = sorted(boundaries)
+    start: int
+    end: int
+    for start, end in zip(ordered, ordered[1:]):
+        for index in starts.get(start, []):
+            heappush(active, (index, sections[index].end))
+
+        # Sections that have ended are only removed once they are the first.
+        while len(active) > 0 and active[0][1] <= start:
+            heappop(active)
+
+        if len(active) == 0:
+            continue
+
+        if len(pieces) > 0 and pieces[-1][1] == start and pieces[-1][2] == active[0][0]:
+            pieces[-1] = (pieces[-1][0], end, active[0][0])
+        else:
+            pieces.append((start, end, active[0][0]))
+
+    return IntervalIndex(pieces)
+
 
 def to_sym(arguments: Namespace, bundle: Bundle) -> None:
     elf_: ELF = ELF(undefined_section=True)
@@ -122,24 +170,32 @@ def to_sym(arguments: Namespace, bundle: Bundle) -> None:
         entry_size=0,
     )
 
-    section_index: int
+    sections_by_address: IntervalIndex[int] = section_indices(bundle.sections)
+
+    addresses: list[int] = [symbol.address for symbol in bundle.symbols]
+
+    section_indices_: list[Optional[int]]
+    if all(previous <= next_ for previous, next_ in zip(addresses, addresses[1:])):
+        section_indices_ = sections_by_address.lookup_many(addresses)
+    else:
+        section_indices_ = [
+            sections_by_address.lookup(address) for address in addresses
+        ]
+
+    section_index: Optional[int]
     symbol: Symbol
-    for symbol in bundle.symbols:
-        for section_index, section in enumerate(bundle.sections):
-            if section.start <= symbol.address < section.end:
-                break
-        else:
+    for symbol, section_index in zip(bundle.symbols, section_indices_):
+        if section_index is None:
             continue
 
-        symbol_table.entries.append(
-            SymbolTableEntry(
-                name=symbol.name,
-                binding=STBind.STB_LOCAL,
-                type_=SYMBOL_TYPES[symbol.type],
-                visibility=STVisibility.STV_DEFAULT,
-                section_index=section_index + 1,
-                value=symbol.address,
-                size=0,
+        symbol_table.rows.append(
+            (
+                symbol.name,
+                SYMBOL_INFOS[symbol.type],
+                STVisibility.STV_DEFAULT,
+                section_index + 1,
+                symbol.address,
+                0,
             )
         )
 
@@ -147,15 +203,15 @@ def to_sym(arguments: Namespace, bundle: Bundle) -> None:
 
     sym_file: BinaryIO
     with arguments.sym.open("wb") as sym_file:
-        sym_file.write(
-            elf_.to_bytes(
-                fnn(arguments._64_bit, bundle._64_bit, True),
-                fnn(arguments.big_endian, bundle.big_endian, True),
-                abi=fnn(arguments.abi, EIOSABI.ELFOSABI_NONE),
-                abi_version=fnn(arguments.abi_version, 0),
-                type_=fnn(arguments.type, EType.ET_NONE),
-                machine=fnn(arguments.machine, EMachine.EM_NONE),
-                entry_pont=fnn(arguments.entry_point, 0),
-                flags=fnn(arguments.flags, 0),
-            )
+        elf_.write(
+            sym_file,
+            fnn(arguments._64_bit, bundle._64_bit, True),
+            fnn(arguments.big_endian, bundle.big_endian, True),
+            abi=fnn(arguments.abi, EIOSABI.ELFOSABI_NONE),
+            abi_version=fnn(arguments.abi_version, 0),
+            type_=fnn(arguments.type, EType.ET_NONE),
+            machine=fnn(arguments.machine, EMachine.EM_NONE),
+            entry_pont=fnn(arguments.entry_point, 0),
+            flags=fnn(arguments.flags, 0),
+            merge_string_tails=arguments.merge_string_tails,
         )
@@ -1,7 +1,9 @@
 # https://refspecs.linuxfoundation.org/elf/gabi4+/contents.html
 
-from struct import pack, unpack
-from typing import BinaryIO, Optional
+from io import BytesIO
+from itertools import chain, islice
+from struct import Struct, pack, unpack
+from typing import BinaryIO, Generator, Iterable, Iterator, Optional
 
 from sc.elf.constants import *
 
@@ -477,7 +479,15 @@ class BytesSection(Section):
 
 
 class StringTableSection(Section):
+    # Shorter tails are kept whole, longer ones by their last 4, 8, 16... bytes.
+    TAIL_KEY_SIZE: int = 4
+
     data: bytearray
+    offsets: dict[bytes, int]  # Strings stored or looked up, at their first offset.
+    tail_ends: dict[bytes, int]  # The end of the first string with each tail.
+    more_tail_ends: dict[bytes, list[int]]  # The ends of later ones with long tails.
+    merge_tails: bool  # Store strings that end others only as part of them in extend.
+    saved_size: int  # Bytes saved by merging tails.
 
     def __init__(
         self,
@@ -491,7 +501,11 @@ class StringTableSection(Section):
         info: Optional[int] = None,
         alignment: Optional[int] = None,
         entry_size: Optional[int] = None,
+        merge_tails: bool = False,
     ) -> None:
+        self.merge_tails = merge_tails
+        self.saved_size = 0
+
         if file is not None and header is not None and name is not None:
             super().__init__(
                 name,
@@ -518,6 +532,9 @@ class StringTableSection(Section):
                 name, type_, flags, address, link, info, alignment, entry_size
             )
             self.data = bytearray()
+            self.offsets = {}
+            self.tail_ends = {}
+            self.more_tail_ends = {}
         else:
             raise TypeError("Invalid combination of arguments.")
 
@@ -525,6 +542,17 @@ class StringTableSection(Section):
         file.seek(header.sh_offset, 0)
 
         self.data = bytearray(file.read(header.sh_size))
+        self.offsets = {}
+        self.tail_ends = {}
+        self.more_tail_ends = {}
+
+        offset: int = 0
+        string: bytes
+        # The last string is not terminated, so can not be looked up.
+        for string in bytes(self.data).split(b"\x00")[:-1]:
+            self.index(string, offset)
+
+            offset += len(string) + 1
 
     def to_bytes(self) -> bytes:
         return bytes(self.data)
@@ -535,6 +563,83 @@ class StringTableSection(Section):
         self.data += string
         self.data += b"\x00"
 
+        self.offsets.setdefault(string, offset)
+        self.index(string, offset)
+
+        return offset
+
+    def index(self, string: bytes, offset: int) -> None:
+        """
+        Indexes the tails of a string stored at the offset, later than any before it.
+        """
+
+        size: int = len(string)
+        end: int = offset + size
+        tail_ends: dict[bytes, int] = self.tail_ends
+
+        tail: bytes
+        # A tail is indexed with its own tails, so those are known already.
+        if string[-3:] not in tail_ends:
+            # Tails of a short string are the whole of it, repeated.
+            for tail in (string[-3:], string[-2:], string[-1:], b""):
+                tail_ends.setdefault(tail, end)
+
+        length: int = self.TAIL_KEY_SIZE
+        while length <= size:
+            tail = string[-length:]
+
+            # Most are the only string with their last bytes.
+            if tail_ends.setdefault(tail, end) != end:
+                self.more_tail_ends.setdefault(tail, []).append(end)
+
+            length *= 2
+
+    def lookup(self, string: bytes) -> Optional[int]:
+        """
+        The first offset of the string, whole or as the tail of a longer one, like
+        searching the table for it.
+        """
+
+        offset: Optional[int] = self.offsets.get(string)
+
+        if offset is not None:
+            return offset
+
+        if b"\x00" in string:  # Never indexed, as it spans strings.
+            offset = self.data.find(string + b"\x00")
+
+            return offset if offset >= 0 else None
+
+        size: int = len(string)
+
+        tail: bytes = string
+        if size >= self.TAIL_KEY_SIZE:
+            # The longest of 4, 8, 16... bytes that the string has.
+            tail = string[
+                -(
+                    self.TAIL_KEY_SIZE
+                    << ((size // self.TAIL_KEY_SIZE).bit_length() - 1)
+                ) :
+            ]
+
+        end: Optional[int] = self.tail_ends.get(tail)
+
+        if end is None:
+            return None
+
+        if tail is string or self.data[end - size : end] == string:
+            offset = end - size
+        elif tail in self.more_tail_ends:
+            # Ends are in order, so the first match is the first offset.
+            for end in self.more_tail_ends[tail]:
+                if self.data[end - size : end] == string:
+                    offset = end - size
+                    break
+
+        # Strings added later are after it, so it stays the first offset.
+        if offset is not None:
+            self.offsets[string] = offset
+
         return offset
 
     def string(self, offset: int) -> bytes:
@@ -554,17 +659,70 @@ class StringTableSection(Section):
             raise ValueError("Offset not in table.")
 
     def offset(self, string: bytes) -> int:
-        try:
-            return self.data.index(string + b"\x00")
-        except ValueError:
+        offset: Optional[int] = self.lookup(string)
+
+        if offset is None:
             raise ValueError("String not in table.")
 
+        return offset
+
     def offset_or_append(self, string: bytes) -> int:
-        try:
-            return self.offset(string)
-        except ValueError:
+        offset: Optional[int] = self.lookup(string)
+
+        if offset is None:
             return self.append(string)
 
+        return offset
+
+    def extend(self, strings: Iterable[bytes]) -> int:
+        """
+        Adds the strings that are not in the table yet, returning the number of bytes
+        saved by merging tails.
+        When merging tails, the strings are sorted by their reverse, so one that ends
+        another comes straight after it and is pointed into it instead of appended.
+        """
+
+        string: bytes
+        if not self.merge_tails:
+            for string in strings:
+                self.offset_or_append(string)
+
+            return 0
+
+        new_strings: list[bytes] = sorted(
+            {string for string in strings if self.lookup(string) is None},
+            key=lambda string: string[::-1],
+            reverse=True,
+        )
+
+        saved_size: int = 0
+        owner: bytes = b""  # The last appended string, which later ones may end.
+        owner_offset: Optional[int] = None
+        for string in new_strings:
+            if owner_offset is not None and owner.endswith(string):
+                # Found in the owner (or earlier) when looked up.
+                saved_size += len(string) + 1
+            else:
+                owner = string
+                owner_offset = self.append(string)
+
+        self.saved_size += saved_size
+
+        return saved_size
+
+
+# Name offset, value, size, info, other and section index for 32 bit, and name offset,
+# info, other, section index, value and size for 64 bit. By word size and endianness.
+SYMBOL_TABLE_ENTRY_STRUCTS: dict[tuple[int, str], Struct] = {
+    (4, "<"): Struct("<IIIBBH"),
+    (4, ">"): Struct(">IIIBBH"),
+    (8, "<"): Struct("<IBBHQQ"),
+    (8, ">"): Struct(">IBBHQQ"),
+}
+
+# An entry without the object: name, info, other, section index, value and size.
+SymbolTableRow = tuple[bytes, int, int, int, int, int]
+
 
 class SymbolTableEntry:
     name: bytes
@@ -647,31 +805,39 @@ class SymbolTableEntry:
         endian_format: str,
         string_table: StringTableSection,
     ) -> bytes:
-        result: bytearray = bytearray()
-
-        result += pack(f"{endian_format}I", string_table.offset_or_append(self.name))
-
-        if word_size == 4:
-            result += pack(
-                f"{endian_format}{word_format}{word_format}", self.value, self.size
-            )
+        name_offset: int = string_table.offset_or_append(self.name)
 
         info: int = (self.binding << 4) | self.type
 
         other: int = self.visibility
 
-        result += pack(f"{endian_format}BBH", info, other, self.section_index)
+        struct: Struct = SYMBOL_TABLE_ENTRY_STRUCTS[(word_size, endian_format)]
 
-        if word_size == 8:
-            result += pack(
-                f"{endian_format}{word_format}{word_format}", self.value, self.size
+        if word_size == 4:
+            return struct.pack(
+                name_offset, self.value, self.size, info, other, self.section_index
+            )
+        else:
+            return struct.pack(
+                name_offset, info, other, self.section_index, self.value, self.size
             )
 
-        return bytes(result)
+    def row(self) -> SymbolTableRow:
+        return (
+            self.name,
+            (self.binding << 4) | self.type,
+            self.visibility,
+            self.section_index,
+            self.value,
+            self.size,
+        )
 
 
 class SymbolTableSection(Section):
+    CHUNK_SIZE: int = 0x10000  # Entries packed at a time when writing.
+
     entries: list[SymbolTableEntry]
+    rows: list[SymbolTableRow]  # Added in bulk, and written after the entries.
 
     def __init__(
         self,
@@ -720,6 +886,7 @@ class SymbolTableSection(Section):
                 name, type_, flags, address, link, info, alignment, entry_size
             )
             self.entries = []
+            self.rows = []
         else:
             raise TypeError("Invalid combination of arguments.")
 
@@ -736,6 +903,7 @@ class SymbolTableSection(Section):
         file.seek(header.sh_offset + entry_size, 0)
 
         self.entries = []
+        self.rows = []
         for _ in range((header.sh_size // entry_size) - 1):
             self.entries.append(
                 SymbolTableEntry(
@@ -743,6 +911,64 @@ class SymbolTableSection(Section):
                 )
             )
 
+    def size(self, word_size: int) -> int:
+        return (len(self.entries) + len(self.rows) + 1) * (8 + (word_size * 2))
+
+    def all_rows(self) -> Iterator[SymbolTableRow]:
+        return chain((entry.row() for entry in self.entries), self.rows)
+
+    def pack_rows(
+        self,
+        result: bytearray,
+        offset: int,
+        rows: Iterable[SymbolTableRow],
+        word_size: int,
+        endian_format: str,
+        string_table: StringTableSection,
+    ) -> int:
+        """
+        Packs the rows into the buffer from the offset, returning the offset after them.
+        """
+
+        struct: Struct = SYMBOL_TABLE_ENTRY_STRUCTS[(word_size, endian_format)]
+        pack_into = struct.pack_into
+        offset_or_append = string_table.offset_or_append
+
+        name: bytes
+        info: int
+        other: int
+        section_index: int
+        value: int
+        size: int
+        if word_size == 4:
+            for name, info, other, section_index, value, size in rows:
+                pack_into(
+                    result,
+                    offset,
+                    offset_or_append(name),
+                    value,
+                    size,
+                    info,
+                    other,
+                    section_index,
+                )
+                offset += struct.size
+        else:
+            for name, info, other, section_index, value, size in rows:
+                pack_into(
+                    result,
+                    offset,
+                    offset_or_append(name),
+                    info,
+                    other,
+                    section_index,
+                    value,
+                    size,
+                )
+                offset += struct.size
+
+        return offset
+
     def to_bytes(
         self,
         word_size: int,
@@ -750,19 +976,60 @@ class SymbolTableSection(Section):
         endian_format: str,
         string_table: StringTableSection,
     ) -> bytes:
-        result: bytearray = bytearray()
+        entry_size: int = 8 + (word_size * 2)
+
+        # The reserved entry stays zeroed.
+        result: bytearray = bytearray(self.size(word_size))
+
+        self.pack_rows(
+            result, entry_size, self.all_rows(), word_size, endian_format, string_table
+        )
+
+        return bytes(result)
+
+    def write(
+        self,
+        file: BinaryIO,
+        word_size: int,
+        word_format: str,
+        endian_format: str,
+        string_table: StringTableSection,
+    ) -> None:
+        """
+        Writes the same bytes as to_bytes, packing CHUNK_SIZE entries at a time.
+        """
 
         entry_size: int = 8 + (word_size * 2)
 
-        result += b"\x00" * entry_size
+        file.write(bytes(entry_size))  # Reserved.
+
+        chunk: bytearray = bytearray(SymbolTableSection.CHUNK_SIZE * entry_size)
+
+        rows: Iterator[SymbolTableRow] = self.all_rows()
+        end: int
+        while True:
+            end = self.pack_rows(
+                chunk,
+                0,
+                islice(rows, SymbolTableSection.CHUNK_SIZE),
+                word_size,
+                endian_format,
+                string_table,
+            )
+
+            if end == 0:
+                break
 
+            file.write(memoryview(chunk)[:end])
+
+    def names(self) -> Generator[bytes, None, None]:
         entry: SymbolTableEntry
         for entry in self.entries:
-            result += entry.to_bytes(
-                word_size, word_format, endian_format, string_table
-            )
+            yield entry.name
 
-        return bytes(result)
+        row: SymbolTableRow
+        for row in self.rows:
+            yield row[0]
 
 
 class ELF:
@@ -866,8 +1133,9 @@ class ELF:
 
             self.sections.append(section)
 
-    def to_bytes(
+    def write(
         self,
+        file: BinaryIO,
         _64_bit: bool,
         big_endian: bool,
         section_header_string_table_index: Optional[int] = None,
@@ -878,7 +1146,13 @@ class ELF:
         machine: EMachine = EMachine.EM_NONE,
         entry_pont: int = 0,
         flags: int = 0,
-    ) -> bytes:
+        merge_string_tails: bool = False,
+    ) -> None:
+        """
+        Writes the ELF to a file in order, with only a chunk of it in memory at a time.
+        The layout is worked out first, which needs every name in the string tables.
+        """
+
         section_header_string_table: Section
         if section_header_string_table_index is None:
             section_header_string_table_index = len(self.sections)
@@ -892,6 +1166,7 @@ class ELF:
                 info=0,
                 alignment=1,
                 entry_size=0,
+                merge_tails=merge_string_tails,
             )
 
             self.sections.append(section_header_string_table)
@@ -919,6 +1194,7 @@ class ELF:
                 info=0,
                 alignment=1,
                 entry_size=0,
+                merge_tails=merge_string_tails,
             )
 
             self.sections.append(symbol_table_string_table)
@@ -954,54 +1230,43 @@ class ELF:
             e_shstrndx=section_header_string_table_index,
         )
 
-        section_header_name_offsets: list[int] = []
-        section_header_name_offset: int
-        section_bytes: list[Optional[bytes]] = []
-        section_bytes_: Optional[bytes]
         section: Section
+
+        # All names are added up front, so tails can be merged across them and the
+        # sizes of the string tables are known before anything is written.
+        section_header_string_table.extend(section.name for section in self.sections)
+
         for section in self.sections:
-            section_header_name_offset = section_header_string_table.offset_or_append(
-                section.name
-            )
-            section_header_name_offsets.append(section_header_name_offset)
+            if isinstance(section, SymbolTableSection):
+                symbol_table_string_table.extend(section.names())
 
-            if section in (section_header_string_table, symbol_table_string_table):
-                section_bytes_ = None
-            else:
-                if isinstance(section, BytesSection) or isinstance(
-                    section, StringTableSection
-                ):
-                    section_bytes_ = section.to_bytes()
-                elif isinstance(section, SymbolTableSection):
-                    section.link = symbol_table_string_table_index
-                    section.entry_size = 8 + (elf_header.word_size * 2)
-
-                    section_bytes_ = section.to_bytes(
-                        elf_header.word_size,
-                        elf_header.word_format,
-                        elf_header.endian_format,
-                        symbol_table_string_table,
-                    )
-                else:
-                    raise TypeError("Unknown section type.")
+        section_header_name_offsets: list[int] = []
+        section_sizes: list[int] = []
+        for section in self.sections:
+            section_header_name_offsets.append(
+                section_header_string_table.offset_or_append(section.name)
+            )
 
-            section_bytes.append(section_bytes_)
+            if isinstance(section, BytesSection) or isinstance(
+                section, StringTableSection
+            ):
+                section_sizes.append(len(section.data))
+            elif isinstance(section, SymbolTableSection):
+                section.link = symbol_table_string_table_index
+                section.entry_size = 8 + (elf_header.word_size * 2)
 
-        section_bytes[
-            section_header_string_table_index
-        ] = section_header_string_table.to_bytes()
-        section_bytes[
-            symbol_table_string_table_index
-        ] = symbol_table_string_table.to_bytes()
+                section_sizes.append(section.size(elf_header.word_size))
+            else:
+                raise TypeError("Unknown section type.")
 
         offset: int = 0
         program_headers: list[ProgramHeader] = []
         section_headers: list[SectionHeader] = []
-        for section, section_bytes_, section_header_name_offset in zip(
-            self.sections, section_bytes, section_header_name_offsets
+        section_size: int
+        section_header_name_offset: int
+        for section, section_size, section_header_name_offset in zip(
+            self.sections, section_sizes, section_header_name_offsets
         ):
-            assert section_bytes_ is not None, "UNEXPECTED"
-
             if section.flags & SHFlags.SHF_ALLOC:
                 program_headers.append(
                     ProgramHeader(
@@ -1012,8 +1277,8 @@ class ELF:
                         p_offset=offset,
                         p_vaddr=section.address,
                         p_paddr=section.address,
-                        p_filesz=len(section_bytes_),
-                        p_memsz=len(section_bytes_),
+                        p_filesz=section_size,
+                        p_memsz=section_size,
                         p_align=section.alignment,
                     )
                 )
@@ -1025,7 +1290,7 @@ class ELF:
                     sh_flags=section.flags,
                     sh_addr=section.address,
                     sh_offset=offset,
-                    sh_size=len(section_bytes_),
+                    sh_size=section_size,
                     sh_link=section.link,
                     sh_info=section.info,
                     sh_addralign=section.alignment,
@@ -1033,7 +1298,7 @@ class ELF:
                 )
             )
 
-            offset += len(section_bytes_)
+            offset += section_size
 
         elf_header.e_phentsize = 8 + (6 * elf_header.word_size)
         elf_header.e_phnum = len(program_headers)
@@ -1049,13 +1314,13 @@ class ELF:
 
         elf_header.e_shoff = offset + offset_adjustment
 
-        result: list[bytes] = [elf_header.to_bytes()]
+        file.write(elf_header.to_bytes())
 
         program_header: ProgramHeader
         for program_header in program_headers:
             program_header.p_offset += offset_adjustment
 
-            result.append(
+            file.write(
                 program_header.to_bytes(
                     elf_header.word_size,
                     elf_header.word_format,
@@ -1063,16 +1328,29 @@ class ELF:
                 )
             )
 
-        for section_bytes_ in section_bytes:
-            assert section_bytes_ is not None, "UNEXPECTED"
+        for section in self.sections:
+            if isinstance(section, SymbolTableSection):
+                section.write(
+                    file,
+                    elf_header.word_size,
+                    elf_header.word_format,
+                    elf_header.endian_format,
+                    symbol_table_string_table,
+                )
+            elif isinstance(section, BytesSection) or isinstance(
+                section, StringTableSection
+            ):
+                file.write(section.data)
 
-            result.append(section_bytes_)
+        assert section_sizes[symbol_table_string_table_index] == len(
+            symbol_table_string_table.data
+        ), "Symbol table string table changed after the layout."
 
         section_header: SectionHeader
         for section_header in section_headers:
             section_header.sh_offset += offset_adjustment
 
-            result.append(
+            file.write(
                 section_header.to_bytes(
                     elf_header.word_size,
                     elf_header.word_format,
@@ -1080,4 +1358,35 @@ class ELF:
                 )
             )
 
-        return b"".join(result)
+    def to_bytes(
+        self,
+        _64_bit: bool,
+        big_endian: bool,
+        section_header_string_table_index: Optional[int] = None,
+        symbol_table_string_table_index: Optional[int] = None,
+        abi: EIOSABI = EIOSABI.ELFOSABI_NONE,
+        abi_version: int = 0,
+        type_: EType = EType.ET_NONE,
+        machine: EMachine = EMachine.EM_NONE,
+        entry_pont: int = 0,
+        flags: int = 0,
+        merge_string_tails: bool = False,
+    ) -> bytes:
+        file: BytesIO = BytesIO()
+
+        self.write(
+            file,
+            _64_bit,
+            big_endian,
+            section_header_string_table_index=section_header_string_table_index,
+            symbol_table_string_table_index=symbol_table_string_table_index,
+            abi=abi,
+            abi_version=abi_version,
+            type_=type_,
+            machine=machine,
+            entry_pont=entry_pont,
+            flags=flags,
+            merge_string_tails=merge_string_tails,
+        )
+
+        return file.getvalue()
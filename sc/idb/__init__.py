@@ -1,22 +1,46 @@
 from argparse import Namespace
+from typing import BinaryIO
 
 from sc.idb.extractors import (
-    FunctionExtractor,
+    FunctionChunkExtractor,
     FunctionExtractorFunction,
+    ScanEngine,
     SegmentExtractor,
     SegmentExtractorSegment,
+    iterate_functions,
+)
+from sc.idb.idb import (
+    DEFAULT_PAGE_CACHE_SIZE,
+    ID0Mode,
+    IDB,
+    SectionFlags as IDBSectionFlags,
 )
-from sc.idb.idb import IDB, SectionFlags as IDBSectionFlags
 from sc.idb.net_node import NetNodeGenerator
 from sc.structures import Bundle, Section, SectionFlags, Symbol, SymbolType
+from sc.util import fnn
 
 
 def from_idb(arguments: Namespace) -> Bundle:
-    idb_ = IDB(
-        file=arguments.idb.open("rb"),
+    file: BinaryIO
+    idb_: IDB
+    with arguments.idb.open("rb") as file, IDB(
+        file=file,
         sections=IDBSectionFlags.ID0 | IDBSectionFlags.NAM,
         verify_checksum=arguments.verify_checksum,
-    )
+        id0_mode=fnn(arguments.id0_mode, ID0Mode.EAGER),
+        page_cache_size=fnn(arguments.page_cache_size, DEFAULT_PAGE_CACHE_SIZE),
+        memory_map=arguments.memory_map,
+        threads=fnn(arguments.threads, 1),
+        defer=arguments.defer_sections,
+    ) as idb_:
+        return bundle_from_idb(arguments, idb_)
+
+
+def bundle_from_idb(arguments: Namespace, idb_: IDB) -> Bundle:
+    """
+    Builds the bundle from an open IDB. Everything in it is copied out of the IDB, and
+    the views the extractors read are released on return, so the IDB can be closed.
+    """
 
     assert idb_.id0 is not None, ".idb does not contain ID0 section."
     assert idb_.nam is not None, ".idb does not contain NAM section."
@@ -27,7 +51,15 @@ def from_idb(arguments: Namespace) -> Bundle:
 
     net_node_generator: NetNodeGenerator = NetNodeGenerator(idb_.id0)
 
-    segment_extractor: SegmentExtractor = SegmentExtractor(net_node_generator)
+    # Segments and function chunks are read in one sweep, then functions are streamed.
+    engine: ScanEngine = ScanEngine(net_node_generator)
+    segment_extractor: SegmentExtractor = SegmentExtractor(
+        net_node_generator, engine=engine
+    )
+    function_chunk_extractor: FunctionChunkExtractor = FunctionChunkExtractor(
+        net_node_generator, engine=engine
+    )
+    engine.run()
 
     flags: SectionFlags
     segment: SegmentExtractorSegment
@@ -51,29 +83,35 @@ def from_idb(arguments: Namespace) -> Bundle:
 
     names = set(idb_.nam.names)
 
-    function_extractor: FunctionExtractor = FunctionExtractor(net_node_generator)
-
-    functions: dict[int, bytes] = {}
     function: FunctionExtractorFunction
-    for function in function_extractor.functions:
+    for function in iterate_functions(
+        net_node_generator, chunk_extractor=function_chunk_extractor
+    ):
         if function.name is not None:
             if not arguments.no_functions:
-                functions[function.head_header.start] = function.name
+                bundle.symbols.append(
+                    Symbol(
+                        function.name, function.head_header.start, SymbolType.FUNCTION
+                    )
+                )
 
             names.discard(function.head_header.start)
         elif arguments.auto_functions:
-            functions[
-                function.head_header.start
-            ] = f"sub_{function.head_header.start:x}".encode()
+            bundle.symbols.append(
+                Symbol(
+                    f"sub_{function.head_header.start:x}".encode(),
+                    function.head_header.start,
+                    SymbolType.FUNCTION,
+                )
+            )
 
     globals_: dict[int, bytes] = {}
     global_: int
-    for global_ in names:
-        if not arguments.no_globals:
-            globals_[global_] = net_node_generator.net_node(global_).name()
+    if not arguments.no_globals:
+        global_names: dict[int, bytes] = net_node_generator.names(names)
 
-    for address, name in functions.items():
-        bundle.symbols.append(Symbol(name, address, SymbolType.FUNCTION))
+        for global_ in names:
+            globals_[global_] = global_names[global_]
 
     for address, name in globals_.items():
         bundle.symbols.append(Symbol(name, address, SymbolType.GLOBAL))
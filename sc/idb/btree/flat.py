@@ -0,0 +1,214 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Generator, Optional
+
+from sc.idb.btree.idb import Page as IDBPage
+from sc.idb.btree.python import Entry, LeafEntry
+from sc.idb.io_ import Buffer
+
+
+class Keys:
+    """
+    A sequence view of the keys of a flat index, so it can be bisected.
+    """
+
+    data: bytes
+    offsets: "array[int]"
+
+    def __init__(self, data: bytes, offsets: "array[int]") -> None:
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        return self.data[self.offsets[index] : self.offsets[index + 1]]
+
+
+class FlatIndex:
+    """
+    All entries of a B-tree in key order, stored as one key blob and one value blob
+    with offset tables instead of an object per entry.
+    Supports the same searches as sc.idb.btree.python.Page.
+    """
+
+    # Every nth key is also kept in a list, so most of a bisection runs in C.
+    SAMPLE_INTERVAL: int = 16
+
+    key_data: bytes
+    key_offsets: "array[int]"
+    value_data: bytes
+    value_offsets: "array[int]"
+    keys: Keys
+    sample: list[bytes]
+    page_count: int
+
+    def __init__(
+        self, root_page_index: int, read_page: Callable[[int], Buffer]
+    ) -> None:
+        self.page_count = 0
+
+        key_data: bytearray = bytearray()
+        value_data: bytearray = bytearray()
+        self.key_offsets = array("Q", [0])
+        self.value_offsets = array("Q", [0])
+
+        self.add_page(root_page_index, read_page, key_data, value_data)
+
+        self.key_data = bytes(key_data)
+        self.value_data = bytes(value_data)
+        self.keys = Keys(self.key_data, self.key_offsets)
+        self.sample = [
+            self.keys[index] for index in range(0, len(self), self.SAMPLE_INTERVAL)
+        ]
+
+    def add_page(
+        self,
+        page_index: int,
+        read_page: Callable[[int], Buffer],
+        key_data: bytearray,
+        value_data: bytearray,
+    ) -> None:
+        """
+        Appends the entries under a page in order. Only reachable pages are decoded.
+        """
+
+        idb_page: IDBPage = IDBPage(read_page(page_index))
+        self.page_count += 1
+
+        index: int
+        key: bytes
+        value: Buffer
+        if idb_page.first_page_index:  # Index
+            self.add_page(idb_page.first_page_index, read_page, key_data, value_data)
+
+            for index, page_index in enumerate(idb_page.page_indices):
+                key_data += idb_page.keys[index]
+                self.key_offsets.append(len(key_data))
+
+                value_data += idb_page.value(index)
+                self.value_offsets.append(len(value_data))
+
+                self.add_page(page_index, read_page, key_data, value_data)
+        else:  # Leaf
+            for key, value in zip(idb_page.keys, idb_page.values()):
+                key_data += key
+                self.key_offsets.append(len(key_data))
+
+                value_data += value
+                self.value_offsets.append(len(value_data))
+
+    def __len__(self) -> int:
+        return len(self.key_offsets) - 1
+
+    def entry(self, index: int) -> Entry:
+        return LeafEntry(
+            self.keys[index],
+            self.value_data[self.value_offsets[index] : self.value_offsets[index + 1]],
+        )
+
+    def bisect(self, key: bytes, right: bool) -> int:
+        """
+        Finds the block of keys with the sample, then bisects within it.
+        """
+
+        bisect_: Callable[..., int] = bisect_right if right else bisect_left
+
+        block: int = bisect_(self.sample, key)
+
+        return bisect_(
+            self.keys,
+            key,
+            max(block - 1, 0) * self.SAMPLE_INTERVAL,
+            min(block * self.SAMPLE_INTERVAL, len(self)),
+        )
+
+    def lower_index(self, min_: Optional[bytes], min_inclusive: bool) -> int:
+        """
+        Index of the first entry above the minimum.
+        """
+
+        if min_ is None:
+            return 0
+        elif min_inclusive:
+            return self.bisect(min_, False)
+        else:
+            return self.bisect(min_, True)
+
+    def upper_index(self, max_: Optional[bytes], max_inclusive: bool) -> int:
+        """
+        Index after the last entry below the maximum.
+        """
+
+        if max_ is None:
+            return len(self)
+        elif max_inclusive:
+            return self.bisect(max_, True)
+        else:
+            return self.bisect(max_, False)
+
+    def search(
+        self,
+        min_: Optional[bytes] = None,
+        max_: Optional[bytes] = None,
+        min_inclusive: bool = True,
+        max_inclusive: bool = False,
+        lowest: bool = True,
+    ) -> Optional[Entry]:
+        # Only one bound has to be bisected, the other just has to hold for the result.
+        index: int
+        key: bytes
+        if lowest:
+            index = self.lower_index(min_, min_inclusive)
+
+            if index == len(self):
+                return None
+
+            key = self.keys[index]
+
+            if max_ is not None and (key > max_ or (key == max_ and not max_inclusive)):
+                return None
+        else:
+            index = self.upper_index(max_, max_inclusive) - 1
+
+            if index < 0:
+                return None
+
+            key = self.keys[index]
+
+            if min_ is not None and (key < min_ or (key == min_ and not min_inclusive)):
+                return None
+
+        return self.entry(index)
+
+    def iterate(
+        self, min_: Optional[bytes] = None, min_inclusive: bool = True
+    ) -> Generator[Entry, None, None]:
+        """
+        Yields the entries above the minimum in key order.
+        """
+
+        # Sliced here rather than through entry, as walks build an entry per record.
+        key_data: bytes = self.key_data
+        key_offsets: "array[int]" = self.key_offsets
+        value_data: bytes = self.value_data
+        value_offsets: "array[int]" = self.value_offsets
+
+        index: int
+        for index in range(self.lower_index(min_, min_inclusive), len(self)):
+            yield LeafEntry(
+                key_data[key_offsets[index] : key_offsets[index + 1]],
+                value_data[value_offsets[index] : value_offsets[index + 1]],
+            )
+
+    def reverse_iterate(
+        self, max_: Optional[bytes] = None, max_inclusive: bool = True
+    ) -> Generator[Entry, None, None]:
+        """
+        Yields the entries below the maximum in reverse key order.
+        """
+
+        index: int
+        for index in range(self.upper_index(max_, max_inclusive) - 1, -1, -1):
+            yield self.entry(index)
@@ -1,73 +1,96 @@
-from struct import unpack
-from typing import Type
+from array import array
+from struct import Struct
 
+from sc.idb.io_ import Buffer
 
-class Entry:
-    key_length: int
-    key: bytes
-    value_length: int
-    value: bytes
+PAGE_HEADER: Struct = Struct("<IH")  # First page index, count.
+LEAF_ENTRY: Struct = Struct("<H2xH")  # Indent, record offset.
+INDEX_ENTRY: Struct = Struct("<IH")  # Page index, record offset.
+LENGTH: Struct = Struct("<H")
 
-    def __init__(self, data: bytes, offset: int, last_key: bytes) -> None:
-        pass
-
-    def process_record(self, data: bytes, record_offset: int) -> None:
-        (self.key_length,) = unpack("<H", data[record_offset : record_offset + 2])
-        record_offset += 2
-
-        self.key = data[record_offset : record_offset + self.key_length]
-        record_offset += self.key_length
-
-        (self.value_length,) = unpack("<H", data[record_offset : record_offset + 2])
-        record_offset += 2
-
-        self.value = data[record_offset : record_offset + self.value_length]
-        record_offset += self.value_length
-
-
-class LeafEntry(Entry):
-    indent: int
-
-    def __init__(self, data: bytes, offset: int, last_key: bytes) -> None:
-        super().__init__(data, offset, last_key)
-
-        record_offset: int
-        self.indent, record_offset = unpack("<H2xH", data[offset : offset + 6])
-
-        self.process_record(data, record_offset)
-
-        self.key = last_key[0 : self.indent] + self.key
-
-
-class IndexEntry(Entry):
-    page_index: int
-
-    def __init__(self, data: bytes, offset: int, last_key: bytes) -> None:
-        super().__init__(data, offset, last_key)
-
-        record_offset: int
-        self.page_index, record_offset = unpack("<IH", data[offset : offset + 6])
-
-        self.process_record(data, record_offset)
+ENTRY_SIZE: int = 6
 
 
 class Page:
+    """
+    A page decoded into flat tables rather than an object per entry.
+    Keys are materialised (leaf keys are prefix compressed, so have to be rebuilt),
+    values are only located and sliced out of the page data on request.
+    """
+
+    data: Buffer
     first_page_index: int
     count: int
-    entries: list[Entry]
+    keys: list[bytes]
+    value_offsets: "array[int]"
+    value_lengths: "array[int]"
+    page_indices: "array[int]"  # Only populated for index pages.
 
-    def __init__(self, data: bytes) -> None:
-        self.first_page_index, self.count = unpack("<IH", data[0:6])
+    def __init__(self, data: Buffer) -> None:
+        self.data = data
 
-        entry_type: Type[Entry]
-        if self.first_page_index:
-            entry_type = IndexEntry
-        else:
-            entry_type = LeafEntry
+        self.first_page_index, self.count = PAGE_HEADER.unpack_from(data, 0)
 
-        self.entries = []
-        last_key = b""
+        keys: list[bytes] = []
+        value_offsets: list[int] = []
+        value_lengths: list[int] = []
+        page_indices: list[int] = []
 
-        for i in range(self.count):
-            self.entries.append(entry_type(data, 6 * (i + 1), last_key))
-            last_key = self.entries[-1].key
+        unpack_length = LENGTH.unpack_from
+
+        key_length: int
+        key_offset: int
+        value_offset: int
+        record_offset: int
+        offset: int
+        if self.first_page_index:  # Index
+            unpack_index_entry = INDEX_ENTRY.unpack_from
+
+            page_index: int
+            for offset in range(ENTRY_SIZE, ENTRY_SIZE * (self.count + 1), ENTRY_SIZE):
+                page_index, record_offset = unpack_index_entry(data, offset)
+
+                (key_length,) = unpack_length(data, record_offset)
+                key_offset = record_offset + 2
+                value_offset = key_offset + key_length
+
+                keys.append(bytes(data[key_offset:value_offset]))
+                value_lengths.append(unpack_length(data, value_offset)[0])
+                value_offsets.append(value_offset + 2)
+                page_indices.append(page_index)
+        else:  # Leaf
+            unpack_leaf_entry = LEAF_ENTRY.unpack_from
+
+            indent: int
+            last_key: bytes = b""
+            for offset in range(ENTRY_SIZE, ENTRY_SIZE * (self.count + 1), ENTRY_SIZE):
+                indent, record_offset = unpack_leaf_entry(data, offset)
+
+                (key_length,) = unpack_length(data, record_offset)
+                key_offset = record_offset + 2
+                value_offset = key_offset + key_length
+
+                # Keys share their first indent bytes with the previous key.
+                last_key = last_key[:indent] + data[key_offset:value_offset]
+
+                keys.append(last_key)
+                value_lengths.append(unpack_length(data, value_offset)[0])
+                value_offsets.append(value_offset + 2)
+
+        self.keys = keys
+        self.value_offsets = array("H", value_offsets)
+        self.value_lengths = array("H", value_lengths)
+        self.page_indices = array("I", page_indices)
+
+    def value(self, index: int) -> Buffer:
+        offset: int = self.value_offsets[index]
+
+        return self.data[offset : offset + self.value_lengths[index]]
+
+    def values(self) -> list[Buffer]:
+        data: Buffer = self.data
+
+        return [
+            data[offset : offset + length]
+            for offset, length in zip(self.value_offsets, self.value_lengths)
+        ]
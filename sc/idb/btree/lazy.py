@@ -0,0 +1,100 @@
+from typing import Callable, Optional
+
+from sc.idb.btree.idb import Page as IDBPage
+from sc.idb.btree.python import (
+    Entry,
+    IndexEntry as PythonIndexEntry,
+    IndexPage,
+    LeafEntry,
+    LeafPage,
+    Page,
+)
+from sc.idb.io_ import Buffer
+from sc.util import LRUCache
+
+
+class IndexEntry(PythonIndexEntry):
+    """
+    An index entry that only refers to its child pages by index.
+    The pages are fetched from the page cache whenever they are accessed.
+    """
+
+    page_cache: "PageCache"
+    before_page_index: int
+    after_page_index: int
+
+    def __init__(
+        self,
+        key: bytes,
+        value: Buffer,
+        before_page_index: int,
+        after_page_index: int,
+        page_cache: "PageCache",
+    ) -> None:
+        Entry.__init__(self, key, value)
+
+        self.before_page_index = before_page_index
+        self.after_page_index = after_page_index
+        self.page_cache = page_cache
+
+    def __repr__(self) -> str:
+        return f"LazyIndex{Entry.__repr__(self)}, before_page_index={self.before_page_index}, after_page_index={self.after_page_index}>"
+
+    @property
+    def before_page(self) -> Page:  # type: ignore[override]
+        return self.page_cache.page(self.before_page_index)
+
+    @property
+    def after_page(self) -> Page:  # type: ignore[override]
+        return self.page_cache.page(self.after_page_index)
+
+
+class PageCache:
+    """
+    Decodes pages the first time they are reached and keeps the most recently used
+    ones in memory.
+    """
+
+    read_page: Callable[[int], Buffer]
+    pages: LRUCache[int, Page]
+
+    def __init__(self, read_page: Callable[[int], Buffer], maximum_size: int) -> None:
+        self.read_page = read_page
+        self.pages = LRUCache(maximum_size)
+
+    def page(self, page_index: int) -> Page:
+        page: Optional[Page] = self.pages.get(page_index)
+
+        if page is None:
+            page = self.decode_page(page_index)
+
+            self.pages[page_index] = page
+
+        return page
+
+    def decode_page(self, page_index: int) -> Page:
+        idb_page: IDBPage = IDBPage(self.read_page(page_index))
+
+        key: bytes
+        value: Buffer
+        if idb_page.first_page_index:  # Index
+            index_entries: list[PythonIndexEntry] = []
+            last_page_index: int = idb_page.first_page_index
+            next_page_index: int
+            for key, value, next_page_index in zip(
+                idb_page.keys, idb_page.values(), idb_page.page_indices
+            ):
+                index_entries.append(
+                    IndexEntry(key, value, last_page_index, next_page_index, self)
+                )
+
+                last_page_index = next_page_index
+
+            return IndexPage(index_entries)
+        else:  # Leaf
+            return LeafPage(
+                [
+                    LeafEntry(key, value)
+                    for key, value in zip(idb_page.keys, idb_page.values())
+                ]
+            )
@@ -1,11 +1,14 @@
-from typing import Optional, Sequence
+from bisect import bisect_left, bisect_right
+from typing import Generator, Optional, Sequence
+
+from sc.idb.io_ import Buffer
 
 
 class Entry:
     key: bytes
-    value: bytes
+    value: Buffer
 
-    def __init__(self, key: bytes, value: bytes) -> None:
+    def __init__(self, key: bytes, value: Buffer) -> None:
         self.key = key
         self.value = value
 
@@ -23,7 +26,7 @@ class IndexEntry(Entry):
     after_page: "Page"
 
     def __init__(
-        self, key: bytes, value: bytes, before_page: "Page", after_page: "Page"
+        self, key: bytes, value: Buffer, before_page: "Page", after_page: "Page"
     ) -> None:
         super().__init__(key, value)
 
@@ -36,9 +39,11 @@ class IndexEntry(Entry):
 
 class Page:
     entries: Sequence[Entry]
+    keys: list[bytes]  # Sorted keys of entries, used for bisection.
 
     def __init__(self, entries: Sequence[Entry]) -> None:
         self.entries = [entry for entry in entries]
+        self.keys = [entry.key for entry in self.entries]
 
     def __repr__(self) -> str:
         return f"""Page<entries={repr(self.entries)}"""
@@ -60,27 +65,18 @@ class Page:
         ):
             return None
 
-        entry_: Entry
+        index: int
         entry: Optional[Entry] = None
-        # TODO: Replace with binary search.
         if lowest:
-            for entry_ in self.entries:
-                if (
-                    min_ is None
-                    or (min_inclusive and (entry_.key >= min_))
-                    or (not min_inclusive and (entry_.key > min_))
-                ):
-                    entry = entry_
-                    break
+            index = self.lower_index(min_, min_inclusive)
+
+            if index < len(self.keys):
+                entry = self.entries[index]
         else:
-            for entry_ in self.entries[::-1]:
-                if (
-                    max_ is None
-                    or (max_inclusive and (entry_.key <= max_))
-                    or (not max_inclusive and (entry_.key < max_))
-                ):
-                    entry = entry_
-                    break
+            index = self.upper_index(max_, max_inclusive)
+
+            if index > 0:
+                entry = self.entries[index - 1]
 
         entry = self.refine_search(
             entry,
@@ -111,6 +107,30 @@ class Page:
 
         return None
 
+    def lower_index(self, min_: Optional[bytes], min_inclusive: bool) -> int:
+        """
+        Index of the first entry above the minimum.
+        """
+
+        if min_ is None:
+            return 0
+        elif min_inclusive:
+            return bisect_left(self.keys, min_)
+        else:
+            return bisect_right(self.keys, min_)
+
+    def upper_index(self, max_: Optional[bytes], max_inclusive: bool) -> int:
+        """
+        Index after the last entry below the maximum.
+        """
+
+        if max_ is None:
+            return len(self.keys)
+        elif max_inclusive:
+            return bisect_right(self.keys, max_)
+        else:
+            return bisect_left(self.keys, max_)
+
     def refine_search(
         self,
         entry: Optional[Entry],
@@ -122,6 +142,25 @@ class Page:
     ) -> Optional[Entry]:
         return entry
 
+    def iterate(
+        self, min_: Optional[bytes] = None, min_inclusive: bool = True
+    ) -> Generator[Entry, None, None]:
+        """
+        Yields the entries above the minimum in key order.
+        The first entry is found with a single descent, the rest by walking the tree.
+        """
+
+        yield from self.entries[self.lower_index(min_, min_inclusive) :]
+
+    def reverse_iterate(
+        self, max_: Optional[bytes] = None, max_inclusive: bool = True
+    ) -> Generator[Entry, None, None]:
+        """
+        Yields the entries below the maximum in reverse key order.
+        """
+
+        yield from reversed(self.entries[: self.upper_index(max_, max_inclusive)])
+
 
 class LeafPage(Page):
     entries: Sequence[LeafEntry]
@@ -160,6 +199,12 @@ class IndexPage(Page):
         else:
             assert isinstance(entry, IndexEntry), "UNEXPECTED"
 
+            # Everything in the child page is on the wrong side of an exact match.
+            if (lowest and min_inclusive and entry.key == min_) or (
+                not lowest and max_inclusive and entry.key == max_
+            ):
+                return entry
+
             page = entry.before_page if lowest else entry.after_page
 
         return (
@@ -172,3 +217,41 @@ class IndexPage(Page):
             )
             or entry
         )
+
+    def iterate(
+        self, min_: Optional[bytes] = None, min_inclusive: bool = True
+    ) -> Generator[Entry, None, None]:
+        index: int = self.lower_index(min_, min_inclusive)
+
+        page: Page
+        if index < len(self.entries):
+            page = self.entries[index].before_page
+        else:
+            page = self.entries[-1].after_page
+
+        yield from page.iterate(min_=min_, min_inclusive=min_inclusive)
+
+        entry: IndexEntry
+        for entry in self.entries[index:]:
+            yield entry
+
+            yield from entry.after_page.iterate()
+
+    def reverse_iterate(
+        self, max_: Optional[bytes] = None, max_inclusive: bool = True
+    ) -> Generator[Entry, None, None]:
+        index: int = self.upper_index(max_, max_inclusive)
+
+        page: Page
+        if index > 0:
+            page = self.entries[index - 1].after_page
+        else:
+            page = self.entries[0].before_page
+
+        yield from page.reverse_iterate(max_=max_, max_inclusive=max_inclusive)
+
+        entry: IndexEntry
+        for entry in reversed(self.entries[:index]):
+            yield entry
+
+            yield from entry.before_page.reverse_iterate()
@@ -1,14 +1,170 @@
-from typing import Optional
+from array import array
+from bisect import bisect_left
+from typing import Generator, Iterable, Optional
 
-from sc.idb.btree.python import Entry
-from sc.idb.net_node import NetNode, NetNodeGenerator
+from sc.idb.btree.flat import Keys
+from sc.idb.btree.python import Entry, LeafEntry
+from sc.idb.net_node import Decoder, NetNode, NetNodeGenerator, decoder
+from sc.util import IntervalIndex
+
+DEFAULT_NAME_BATCH_SIZE: int = 1024
+
+# Start (inclusive) and stop (exclusive, None for the end of the keyspace).
+KeyRange = tuple[bytes, Optional[bytes]]
 
 
 class Extractor:
-    def __init__(self, net_node_generator: NetNodeGenerator) -> None:
+    """
+    Registers the key ranges it reads with a scan engine, is fed their entries in key
+    order and builds its results once the sweep has finished.
+    Without an engine, the extractor runs a sweep of its own.
+    """
+
+    net_node_generator: NetNodeGenerator
+
+    def __init__(
+        self,
+        net_node_generator: NetNodeGenerator,
+        engine: Optional["ScanEngine"] = None,
+    ) -> None:
+        self.net_node_generator = net_node_generator
+
+        if engine is None:
+            engine = ScanEngine(net_node_generator)
+            engine.register(self)
+            engine.run()
+        else:
+            engine.register(self)
+
+    def ranges(self) -> list[KeyRange]:
+        return []
+
+    def feed(self, entry: Entry) -> None:
+        pass
+
+    def finish(self) -> None:
         pass
 
 
+Registration = tuple[bytes, Optional[bytes], Extractor]
+
+
+class ScanEngine:
+    """
+    Reads the key ranges of all registered extractors in one ordered sweep over the
+    ID0, so reads stay sequential however many extractors there are.
+    """
+
+    net_node_generator: NetNodeGenerator
+    extractors: list[Extractor]
+
+    def __init__(self, net_node_generator: NetNodeGenerator) -> None:
+        self.net_node_generator = net_node_generator
+        self.extractors = []
+
+    def register(self, extractor: Extractor) -> None:
+        self.extractors.append(extractor)
+
+    def run(self) -> None:
+        registrations: list[Registration] = sorted(
+            (
+                (start, stop, extractor)
+                for extractor in self.extractors
+                for start, stop in merge_ranges(extractor.ranges())
+            ),
+            key=lambda registration: registration[0],
+        )
+
+        # Overlapping ranges are merged into spans, so each entry is only read once.
+        spans: list[tuple[bytes, Optional[bytes], list[Registration]]] = []
+        start: bytes
+        stop: Optional[bytes]
+        span_start: bytes
+        span_stop: Optional[bytes]
+        members: list[Registration]
+        registration: Registration
+        for registration in registrations:
+            start, stop, _ = registration
+
+            if len(spans) > 0 and (spans[-1][1] is None or start < spans[-1][1]):
+                span_start, span_stop, members = spans[-1]
+                members.append(registration)
+
+                if span_stop is not None and (stop is None or stop > span_stop):
+                    spans[-1] = (span_start, stop, members)
+            else:
+                spans.append((start, stop, [registration]))
+
+        # The ranges of an extractor are disjoint, so it is fed each entry only once.
+        # Only the ranges that contain the current key are checked.
+        active: list[Registration]
+        next_member: int
+        started: bool
+        first_stop: Optional[bytes]  # The first stop of the active ranges.
+        extractor: Extractor
+        entry: Entry
+        for span_start, span_stop, members in spans:
+            active = []
+            next_member = 0
+            first_stop = None
+
+            for entry in self.net_node_generator.id0.scan(
+                start=span_start, stop=span_stop
+            ):
+                started = False
+                while (
+                    next_member < len(members) and members[next_member][0] <= entry.key
+                ):
+                    active.append(members[next_member])
+                    next_member += 1
+                    started = True
+
+                if started:
+                    first_stop = min_stop(active)
+
+                if first_stop is not None and entry.key >= first_stop:
+                    active = [
+                        registration
+                        for registration in active
+                        if registration[1] is None or entry.key < registration[1]
+                    ]
+                    first_stop = min_stop(active)
+
+                for _, _, extractor in active:
+                    extractor.feed(entry)
+
+        for extractor in self.extractors:
+            extractor.finish()
+
+
+def merge_ranges(key_ranges: Iterable[KeyRange]) -> list[KeyRange]:
+    """
+    Sorts key ranges and merges those that overlap or touch.
+    """
+
+    merged: list[KeyRange] = []
+    start: bytes
+    stop: Optional[bytes]
+    for start, stop in sorted(key_ranges, key=lambda key_range: key_range[0]):
+        if len(merged) > 0 and (merged[-1][1] is None or start <= merged[-1][1]):
+            if merged[-1][1] is not None and (stop is None or stop > merged[-1][1]):
+                merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+
+    return merged
+
+
+def min_stop(registrations: list[Registration]) -> Optional[bytes]:
+    """
+    The first stop of the registrations, or None if none of them stop.
+    """
+
+    stops: list[bytes] = [stop for _, stop, _ in registrations if stop is not None]
+
+    return min(stops) if len(stops) > 0 else None
+
+
 class SegmentExtractorSegment:
     start: int
     end: int
@@ -64,13 +220,44 @@ class SegmentExtractorSegment:
 
 
 class SegmentExtractor(Extractor):
+    segment_strings_net_node: NetNode
+    segments_net_node: NetNode
+    segment_strings_entries: list[Entry]
+    segment_entries: list[Entry]
     segments: list[SegmentExtractorSegment]
 
-    def __init__(self, net_node_generator: NetNodeGenerator) -> None:
-        super().__init__(net_node_generator)
+    def __init__(
+        self,
+        net_node_generator: NetNodeGenerator,
+        engine: Optional[ScanEngine] = None,
+    ) -> None:
+        self.segment_strings_net_node = net_node_generator.net_node(b"$ segstrings")
+        self.segments_net_node = net_node_generator.net_node(b"$ segs")
 
-        segment_strings_: bytes = (
-            net_node_generator.net_node(b"$ segstrings").entry(b"S", 0).value
+        self.segment_strings_entries = []
+        self.segment_entries = []
+        self.segments = []
+
+        super().__init__(net_node_generator, engine=engine)
+
+    def ranges(self) -> list[KeyRange]:
+        return [
+            self.segment_strings_net_node.tag_range(b"S"),
+            self.segments_net_node.tag_range(b"S"),
+        ]
+
+    def feed(self, entry: Entry) -> None:
+        if entry.key.startswith(self.segments_net_node.make_key(b"S")):
+            self.segment_entries.append(entry)
+        else:
+            self.segment_strings_entries.append(entry)
+
+    def finish(self) -> None:
+        # The segment strings are a blob over consecutive records from index 0.
+        segment_strings_: memoryview = memoryview(
+            self.segment_strings_net_node.assemble_blob(
+                b"S", self.segment_strings_entries
+            )
         )
 
         segment_strings: list[bytes] = []
@@ -79,16 +266,13 @@ class SegmentExtractor(Extractor):
         while offset < len(segment_strings_):
             length = segment_strings_[offset]
             offset += 1
-            segment_strings.append(segment_strings_[offset : offset + length])
+            segment_strings.append(segment_strings_[offset : offset + length].tobytes())
             offset += length
 
-        segments_net_node: NetNode = net_node_generator.net_node(b"$ segs")
-
-        self.segments = []
         entry: Entry
-        for entry in segments_net_node.entries(b"S"):
+        for entry in self.segment_entries:
             self.segments.append(
-                SegmentExtractorSegment(entry, segments_net_node, segment_strings)
+                SegmentExtractorSegment(entry, self.segments_net_node, segment_strings)
             )
 
 
@@ -152,6 +336,7 @@ class FunctionExtractorFunction:
         self,
         net_nodes_generator: NetNodeGenerator,
         headers: list[FunctionExtractorChunkHeader],
+        names: Optional[dict[int, bytes]] = None,
     ) -> None:
         head_header: Optional[FunctionExtractorChunkHeader] = None
         self.tail_headers = []
@@ -169,40 +354,229 @@ class FunctionExtractorFunction:
 
         self.head_header = head_header
 
-        try:
-            self.name = net_nodes_generator.net_node(self.head_header.start).name()
-        except KeyError:
-            self.name = None
+        if names is not None:  # Already looked up in bulk.
+            self.name = names.get(self.head_header.start)
+        else:
+            try:
+                self.name = net_nodes_generator.net_node(self.head_header.start).name()
+            except KeyError:
+                self.name = None
 
 
 class FunctionExtractor(Extractor):
+    function_header_net_node: NetNode
+    chunk_header_groups: dict[int, list[FunctionExtractorChunkHeader]]
     functions: list[FunctionExtractorFunction]
 
-    def __init__(self, net_node_generator: NetNodeGenerator) -> None:
-        super().__init__(net_node_generator)
+    def __init__(
+        self,
+        net_node_generator: NetNodeGenerator,
+        engine: Optional[ScanEngine] = None,
+    ) -> None:
+        self.function_header_net_node = net_node_generator.net_node(b"$ funcs")
 
-        function_header_net_node = net_node_generator.net_node(b"$ funcs")
+        self.chunk_header_groups = {}
+        self.functions = []
 
-        chunk_header_groups: dict[int, list[FunctionExtractorChunkHeader]] = {}
-        key: int
-        chunk_header: FunctionExtractorChunkHeader
-        entry: Entry
-        for entry in function_header_net_node.entries(b"S"):
-            chunk_header = FunctionExtractorChunkHeader(entry, function_header_net_node)
+        super().__init__(net_node_generator, engine=engine)
 
-            key = chunk_header.parent or chunk_header.start
+    def ranges(self) -> list[KeyRange]:
+        return [self.function_header_net_node.tag_range(b"S")]
 
-            if key in chunk_header_groups:
-                chunk_header_groups[key].append(chunk_header)
-            else:
-                chunk_header_groups[key] = [chunk_header]
+    def feed(self, entry: Entry) -> None:
+        chunk_header: FunctionExtractorChunkHeader = FunctionExtractorChunkHeader(
+            entry, self.function_header_net_node
+        )
+
+        key: int = chunk_header.parent or chunk_header.start
+
+        if key in self.chunk_header_groups:
+            self.chunk_header_groups[key].append(chunk_header)
+        else:
+            self.chunk_header_groups[key] = [chunk_header]
+
+    def finish(self) -> None:
+        # Groups are keyed by the start of their head chunk.
+        names: dict[int, bytes] = self.net_node_generator.names(
+            self.chunk_header_groups
+        )
 
-        self.functions = []
         chunk_header_group: list[FunctionExtractorChunkHeader]
-        for chunk_header_group in chunk_header_groups.values():
+        for chunk_header_group in self.chunk_header_groups.values():
             self.functions.append(
                 FunctionExtractorFunction(
-                    net_node_generator,
+                    self.net_node_generator,
                     chunk_header_group,
+                    names=names,
                 )
             )
+
+
+class FunctionChunkExtractor(Extractor):
+    """
+    Collects the chunks of functions in a sweep, so the functions can then be streamed
+    by iterate_functions. Head chunks do not record their tails, so no function is
+    complete before the sweep is. The heads are kept as raw records in one blob, and
+    only the tails (which are few) are decoded and grouped by their head.
+    """
+
+    function_header_net_node: NetNode
+    flags_decoder: Decoder
+    head_key_data: bytearray
+    head_key_offsets: "array[int]"
+    head_value_data: bytearray
+    head_value_offsets: "array[int]"
+    head_keys: Keys  # Set once the sweep has finished.
+    tail_header_groups: dict[int, list[FunctionExtractorChunkHeader]]
+
+    def __init__(
+        self,
+        net_node_generator: NetNodeGenerator,
+        engine: Optional[ScanEngine] = None,
+    ) -> None:
+        self.function_header_net_node = net_node_generator.net_node(b"$ funcs")
+
+        # Just enough to tell heads and tails apart.
+        self.flags_decoder = decoder("WWT", net_node_generator.id0.word_size)
+
+        self.head_key_data = bytearray()
+        self.head_key_offsets = array("Q", [0])
+        self.head_value_data = bytearray()
+        self.head_value_offsets = array("Q", [0])
+        self.tail_header_groups = {}
+
+        super().__init__(net_node_generator, engine=engine)
+
+    def ranges(self) -> list[KeyRange]:
+        return [self.function_header_net_node.tag_range(b"S")]
+
+    def feed(self, entry: Entry) -> None:
+        if not (
+            self.flags_decoder.decode(entry.value)[0][2]
+            & FunctionExtractorChunkHeader.TAIL
+        ):
+            self.head_key_data += entry.key
+            self.head_key_offsets.append(len(self.head_key_data))
+
+            self.head_value_data += entry.value
+            self.head_value_offsets.append(len(self.head_value_data))
+
+            return
+
+        chunk_header: FunctionExtractorChunkHeader = FunctionExtractorChunkHeader(
+            entry, self.function_header_net_node
+        )
+
+        assert chunk_header.parent is not None, "UNEXPECTED"
+
+        if chunk_header.parent in self.tail_header_groups:
+            self.tail_header_groups[chunk_header.parent].append(chunk_header)
+        else:
+            self.tail_header_groups[chunk_header.parent] = [chunk_header]
+
+    def finish(self) -> None:
+        self.head_keys = Keys(bytes(self.head_key_data), self.head_key_offsets)
+        self.head_key_data = bytearray()
+
+        # Checked before any function is streamed, as a tail is only reached with its
+        # head.
+        key: bytes
+        index: int
+        parent: int
+        for parent in self.tail_header_groups:
+            key = self.function_header_net_node.make_key(b"S", index=parent)
+            index = bisect_left(self.head_keys, key)
+
+            assert (
+                index < len(self.head_keys) and self.head_keys[index] == key
+            ), "No head header."
+
+    def head_entry(self, index: int) -> Entry:
+        return LeafEntry(
+            self.head_keys[index],
+            self.head_value_data[
+                self.head_value_offsets[index] : self.head_value_offsets[index + 1]
+            ],
+        )
+
+
+def iterate_functions(
+    net_node_generator: NetNodeGenerator,
+    name_batch_size: int = DEFAULT_NAME_BATCH_SIZE,
+    chunk_extractor: Optional[FunctionChunkExtractor] = None,
+) -> Generator[FunctionExtractorFunction, None, None]:
+    """
+    Yields the functions in the order of their head chunks without holding them all.
+    The chunks are collected by the chunk extractor, which can share the sweep of a
+    scan engine, and each function is only decoded as it is reached. Names are looked
+    up in batches.
+    """
+
+    if chunk_extractor is None:
+        chunk_extractor = FunctionChunkExtractor(net_node_generator)
+
+    function_header_net_node: NetNode = chunk_extractor.function_header_net_node
+
+    chunk_header: FunctionExtractorChunkHeader
+    chunk_header_groups: list[list[FunctionExtractorChunkHeader]] = []
+    index: int
+    for index in range(len(chunk_extractor.head_keys)):
+        chunk_header = FunctionExtractorChunkHeader(
+            chunk_extractor.head_entry(index), function_header_net_node
+        )
+
+        chunk_header_groups.append(
+            [chunk_header]
+            + chunk_extractor.tail_header_groups.get(chunk_header.start, [])
+        )
+
+        if len(chunk_header_groups) == name_batch_size:
+            yield from named_functions(net_node_generator, chunk_header_groups)
+
+            chunk_header_groups = []
+
+    yield from named_functions(net_node_generator, chunk_header_groups)
+
+
+def named_functions(
+    net_node_generator: NetNodeGenerator,
+    chunk_header_groups: list[list[FunctionExtractorChunkHeader]],
+) -> Generator[FunctionExtractorFunction, None, None]:
+    """
+    Builds the functions of a batch, looking up all of their names at once.
+    """
+
+    # The head chunk comes first in each group.
+    names: dict[int, bytes] = net_node_generator.names(
+        chunk_header_group[0].start for chunk_header_group in chunk_header_groups
+    )
+
+    chunk_header_group: list[FunctionExtractorChunkHeader]
+    for chunk_header_group in chunk_header_groups:
+        yield FunctionExtractorFunction(
+            net_node_generator, chunk_header_group, names=names
+        )
+
+
+def segment_index(
+    segments: Iterable[SegmentExtractorSegment],
+) -> IntervalIndex[SegmentExtractorSegment]:
+    """
+    Indexes segments by their address ranges.
+    """
+
+    return IntervalIndex((segment.start, segment.end, segment) for segment in segments)
+
+
+def function_index(
+    functions: Iterable[FunctionExtractorFunction],
+) -> IntervalIndex[FunctionExtractorFunction]:
+    """
+    Indexes functions by the address ranges of their head and tail chunks.
+    """
+
+    return IntervalIndex(
+        (header.start, header.end, function)
+        for function in functions
+        for header in [function.head_header] + function.tail_headers
+    )
@@ -2,18 +2,37 @@
 # https://github.com/nlitsme/pyidbutil
 # https://github.com/Vector35/idb-parser-rs
 # https://github.com/aerosoul94/tilutil
-from enum import Flag, IntFlag, auto
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum, Flag, IntFlag, auto
+from gc import collect
+from inspect import get_annotations
 from io import BytesIO
+from itertools import count
+from mmap import ACCESS_READ, mmap
 from struct import pack, unpack
-from typing import BinaryIO, Optional, Sequence
-
-import zlib
+from types import TracebackType
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    ClassVar,
+    Generator,
+    Optional,
+    TypeVar,
+    Union,
+)
 
-from sc.idb.btree.idb import (
-    Entry as IDBEntry,
-    IndexEntry as IDBIndexEntry,
-    LeafEntry as IDBLeafEntry,
-    Page as IDBPage,
+from sc.idb.btree.flat import FlatIndex
+from sc.idb.btree.idb import Page as IDBPage
+from sc.idb.btree.lazy import PageCache
+from sc.idb.io_ import (
+    Buffer,
+    ChecksumFile,
+    File,
+    MemoryFile,
+    PositionalFile,
+    ZlibFile,
+    positional_descriptor,
 )
 from sc.idb.btree.python import (
     Entry as PythonEntry,
@@ -28,6 +47,8 @@ WORD_SIZES: dict[bytes, int] = {b"IDA0": 4, b"IDA1": 4, b"IDA2": 8}
 
 WORD_FORMATS: dict[int, str] = {4: "I", 8: "Q"}
 
+DEFAULT_PAGE_CACHE_SIZE: int = 1024
+
 
 class SectionFlags(Flag):
     ID0 = auto()
@@ -56,7 +77,7 @@ class Header:
     id2_offset: int
     id2_checksum: int
 
-    def __init__(self, file: BinaryIO) -> None:
+    def __init__(self, file: File) -> None:
         (
             self.magic,
             self.id0_offset,
@@ -89,7 +110,7 @@ class SectionHeader:
     compression_method: CompressionMethod
     section_length: int
 
-    def __init__(self, file: BinaryIO) -> None:
+    def __init__(self, file: File) -> None:
         compression_method: int
         compression_method, self.section_length = unpack("<BQ", file.read(9))
 
@@ -97,75 +118,205 @@ class SectionHeader:
 
 
 class Section:
+    """
+    The section header is parsed on construction.
+    The body is parsed by load, which runs on the first access to a body attribute.
+    The body is read from the file the section was constructed with, so that file must
+    stay open until the section is loaded.
+    """
+
     header: SectionHeader
     checksum: int
+    verify_checksum: bool
+    body_file: File
+    body_offset: int
+    loaded: bool
+    loading: bool
+    checksum_file: Optional[ChecksumFile]
+    body_attributes: ClassVar[frozenset[str]] = frozenset()
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+
+        # Those declared below Section, which parse sets.
+        cls.body_attributes = frozenset(
+            name
+            for class_ in cls.__mro__
+            if issubclass(class_, Section) and class_ is not Section
+            for name in get_annotations(class_)
+        )
 
-    def __init__(self, file: BinaryIO, checksum: int, verify_checksum: bool = False):
+    def __init__(self, file: File, checksum: int, verify_checksum: bool = False):
         self.header = SectionHeader(file)
         self.checksum = checksum
+        self.verify_checksum = verify_checksum
+        self.body_file = file
+        self.body_offset = file.tell()
+        self.checksum_file = None
+        self.loaded = False
+        self.loading = False
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes that have not been set. Other misses (like typos)
+        # fail without loading the body.
+        if (
+            name not in type(self).body_attributes
+            or self.__dict__.get("loaded", True)
+            or self.__dict__.get("loading", True)
+        ):
+            raise AttributeError(name)
+
+        self.load()
+
+        return getattr(self, name)
+
+    def load(self) -> None:
+        """
+        Decompresses and parses the body, unless that has already been done.
+        """
+
+        if self.loaded:
+            return
+
+        names: set[str] = set(self.__dict__)
+
+        self.loading = True
+
+        try:
+            self.body_file.seek(self.body_offset, 0)
 
-        if verify_checksum:
+            # The checksum is computed while parsing and checked by verify.
             # TODO: Is it correct to do this before decompression?
-            assert (
-                zlib.crc32(file.read(self.header.section_length)) == self.checksum
-            ), "Invalid section checksum."
+            if self.verify_checksum:
+                self.checksum_file = ChecksumFile(
+                    self.body_file, self.header.section_length
+                )
+
+            self.parse(self.body_file)
+        except BaseException:
+            # Nothing half parsed is kept, so the next access parses it again.
+            name: str
+            for name in set(self.__dict__) - names:
+                delattr(self, name)
+
+            self.checksum_file = None
+
+            raise
+        finally:
+            self.loading = False
+
+        self.loaded = True
 
-            file.seek(-self.header.section_length, 1)
+    def parse(self, file: File) -> None:
+        pass
+
+    def decompressed(self, file: File) -> tuple[Optional[int], File]:
+        """
+        Returns the decompressed length (if known up front) and a file to read it from.
+        """
+
+        if self.checksum_file is not None:
+            file = self.checksum_file
 
-    def decompressed(self, file: BinaryIO) -> tuple[int, BinaryIO]:
         if self.header.compression_method == CompressionMethod.NONE:
             return self.header.section_length, file
         elif self.header.compression_method == CompressionMethod.ZLIB:
-            data: bytes = zlib.decompress(file.read(self.header.section_length))
-
-            return len(data), BytesIO(data)
+            # Decompressed as it is read, so the length is not known.
+            return None, ZlibFile(file, self.header.section_length)
         else:
             assert False, "UNEXPECTED"
 
+    def verify(self) -> None:
+        """
+        Checks the checksum once parsing is done, reading whatever the parser skipped.
+        """
+
+        if self.checksum_file is not None:
+            assert (
+                self.checksum_file.finish() == self.checksum
+            ), "Invalid section checksum."
+
 
 def resolve_page(
-    page_index: int, idb_pages: Sequence[IDBPage], python_pages: dict[int, PythonPage]
+    page_index: int,
+    read_page: Callable[[int], Buffer],
+    python_pages: dict[int, PythonPage],
 ) -> PythonPage:
+    """
+    Decodes the tree under a page. Pages that are not reachable are never decoded.
+    """
+
     if page_index in python_pages:
         return python_pages[page_index]
 
-    idb_page: IDBPage = idb_pages[page_index - 1]
+    idb_page: IDBPage = IDBPage(read_page(page_index))
 
-    idb_entry: IDBEntry
+    key: bytes
+    value: Buffer
     python_page: PythonPage
     if idb_page.first_page_index:  # Index
         python_index_entries: list[PythonIndexEntry] = []
-        last_page_index = idb_page.first_page_index
-        for idb_entry in idb_page.entries:
-            assert isinstance(idb_entry, IDBIndexEntry), "UNEXPECTED"
-
+        last_page_index: int = idb_page.first_page_index
+        next_page_index: int
+        for key, value, next_page_index in zip(
+            idb_page.keys, idb_page.values(), idb_page.page_indices
+        ):
             python_index_entries.append(
                 PythonIndexEntry(
-                    idb_entry.key,
-                    idb_entry.value,
-                    resolve_page(last_page_index, idb_pages, python_pages),
-                    resolve_page(idb_entry.page_index, idb_pages, python_pages),
+                    key,
+                    value,
+                    resolve_page(last_page_index, read_page, python_pages),
+                    resolve_page(next_page_index, read_page, python_pages),
                 )
             )
 
-            last_page_index = idb_entry.page_index
+            last_page_index = next_page_index
 
         python_page = PythonIndexPage(python_index_entries)
     else:  # Leaf
-        python_leaf_entries: list[PythonLeafEntry] = []
-        for idb_entry in idb_page.entries:
-            assert isinstance(idb_entry, IDBLeafEntry), "UNEXPECTED"
-
-            python_leaf_entries.append(PythonLeafEntry(idb_entry.key, idb_entry.value))
-
-        python_page = PythonLeafPage(python_leaf_entries)
+        python_page = PythonLeafPage(
+            [
+                PythonLeafEntry(key, value)
+                for key, value in zip(idb_page.keys, idb_page.values())
+            ]
+        )
 
     python_pages[page_index] = python_page
 
     return python_page
 
 
+def prefix_end(prefix: bytes) -> Optional[bytes]:
+    """
+    The lowest key above every key that starts with the prefix, or None if there is
+    no such key.
+    """
+
+    prefix = prefix.rstrip(b"\xff")
+
+    if len(prefix) == 0:
+        return None
+
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+S = TypeVar("S", bound=Section)
+
+
+class ID0Mode(Enum):
+    EAGER = auto()  # Decode the whole B-tree up front.
+    LAZY = auto()  # Decode pages when a search reaches them.
+    FLAT = auto()  # Copy all records into a flat sorted index up front.
+
+
 class ID0(Section):
+    file: Optional[File]
+    data_offset: int
+    mode: ID0Mode
+    page_cache: Optional[PageCache]
+    page_cache_size: int
+    decoded_page_count: Optional[int]  # Only counted in eager mode.
+    skipped_page_count: Optional[int]
     word_size: int
     word_format: str
     next_free_index: int
@@ -174,24 +325,41 @@ class ID0(Section):
     record_count: int
     page_count: int
     magic: bytes
-    root_page: PythonPage
+    root_page: Optional[PythonPage]  # None in flat mode.
+    index: Union[PythonPage, FlatIndex]
 
     def __init__(
         self,
-        file: BinaryIO,
+        file: File,
         checksum: int,
         word_size: int,
         verify_checksum: bool = False,
+        mode: ID0Mode = ID0Mode.EAGER,
+        page_cache_size: int = DEFAULT_PAGE_CACHE_SIZE,
+        defer: bool = False,
     ) -> None:
         super().__init__(file, checksum, verify_checksum=verify_checksum)
 
-        section_length: int
-        section_length, file = self.decompressed(file)
+        self.mode = mode
+        self.page_cache_size = page_cache_size
 
         self.word_size = word_size
 
         self.word_format = WORD_FORMATS[self.word_size]
 
+        if not defer:
+            self.load()
+
+    def parse(self, file: File) -> None:
+        section_length: Optional[int]
+        section_length, file = self.decompressed(file)
+
+        if self.mode == ID0Mode.LAZY and isinstance(file, ZlibFile):
+            # Pages are read in any order, so decompress the section in full.
+            file = MemoryFile(file.read())
+
+        self.data_offset = file.tell()
+
         (
             self.next_free_index,
             self.page_size,
@@ -203,23 +371,136 @@ class ID0(Section):
 
         assert self.magic == b"B-tree v2", "Bad IDA0 magic."
 
-        file.seek(self.page_size - 28, 1)
+        if self.mode == ID0Mode.LAZY:
+            # Pages are read out of order, so the checksum has to be finished first.
+            self.verify()
+
+            # Keep the (decompressed) section around so pages can be read later.
+            self.file = file
+            self.page_cache = PageCache(self.read_page, self.page_cache_size)
+            self.root_page = self.index = self.page_cache.page(self.root_page_index)
+
+            self.decoded_page_count = None
+            self.skipped_page_count = None
+        else:
+            self.page_cache = None
+
+            # The page count does not include dead entries, and free or dead pages are
+            # not distinguished in any way. Only pages reachable from the root are
+            # decoded, which skips them all.
+            page_total: int
+            read_page: Callable[[int], Buffer]
+            if isinstance(file, (ChecksumFile, ZlibFile)):
+                # These can only be read in order, so keep the raw pages around.
+                file.seek(self.page_size - 28, 1)
+
+                raw_pages: list[Buffer] = []
+                page_data: Buffer
+                # Streamed sections have no known length, so they are read until they end.
+                for _ in (
+                    count()
+                    if section_length is None
+                    else range((section_length // self.page_size) - 1)
+                ):
+                    page_data = file.read(self.page_size)
+
+                    if len(page_data) < self.page_size:
+                        break
+
+                    raw_pages.append(page_data)
+
+                page_total = len(raw_pages)
+                read_page = lambda page_index: raw_pages[page_index - 1]
+            else:
+                assert section_length is not None, "UNEXPECTED"
+
+                page_total = (section_length // self.page_size) - 1
+
+                self.file = file
+                read_page = self.read_page
+
+            if self.mode == ID0Mode.FLAT:
+                flat_index: FlatIndex = FlatIndex(self.root_page_index, read_page)
+
+                self.root_page = None
+                self.index = flat_index
+                self.decoded_page_count = flat_index.page_count
+            else:
+                python_pages: dict[int, PythonPage] = {}
+
+                self.root_page = self.index = resolve_page(
+                    self.root_page_index, read_page, python_pages
+                )
+                self.decoded_page_count = len(python_pages)
+
+            self.file = None
+            self.skipped_page_count = page_total - self.decoded_page_count
+
+            self.verify()
+
+    def read_page(self, page_index: int) -> Buffer:
+        assert self.file is not None, "Section file is not available."
+
+        self.file.seek(self.data_offset + (page_index * self.page_size), 0)
 
-        idb_pages: list[IDBPage] = []
-        # The page count does not include dead entries.
-        # TODO: Detect dead entries at this stage? Are they distinguished in any way?
-        for _ in range((section_length // self.page_size) - 1):
-            idb_pages.append(IDBPage(file.read(self.page_size)))
+        return self.file.read(self.page_size)
 
-        self.root_page = resolve_page(self.root_page_index, idb_pages, {})
+    def search(
+        self,
+        min_: Optional[bytes] = None,
+        max_: Optional[bytes] = None,
+        min_inclusive: bool = True,
+        max_inclusive: bool = False,
+        lowest: bool = True,
+    ) -> Optional[PythonEntry]:
+        return self.index.search(min_, max_, min_inclusive, max_inclusive, lowest)
+
+    def iterate(
+        self, min_: Optional[bytes] = None, min_inclusive: bool = True
+    ) -> Generator[PythonEntry, None, None]:
+        return self.index.iterate(min_, min_inclusive)
+
+    def scan(
+        self,
+        start: Optional[bytes] = None,
+        stop: Optional[bytes] = None,
+        prefix: Optional[bytes] = None,
+        reverse: bool = False,
+    ) -> Generator[PythonEntry, None, None]:
+        """
+        Lazily yields the entries from start (inclusive) to stop (exclusive) in key
+        order, or in reverse. A prefix narrows the range to the keys starting with it.
+        """
+
+        if prefix is not None:
+            start = prefix if start is None else max(start, prefix)
+
+            end: Optional[bytes] = prefix_end(prefix)
+
+            if end is not None:
+                stop = end if stop is None else min(stop, end)
+
+        entry: PythonEntry
+        if reverse:
+            for entry in self.index.reverse_iterate(max_=stop, max_inclusive=False):
+                if start is not None and entry.key < start:
+                    break
+
+                yield entry
+        else:
+            for entry in self.index.iterate(min_=start, min_inclusive=True):
+                if stop is not None and entry.key >= stop:
+                    break
+
+                yield entry
 
     def name(self, name: int) -> Optional[bytes]:
         key: bytes = pack(f">s{self.word_format}s", b".", name, b"N")
 
-        entry: Optional[PythonEntry] = self.root_page.search(key, key, True, True)
+        entry: Optional[PythonEntry] = self.search(key, key, True, True)
 
         if entry is not None:
-            return entry.value
+            return bytes(entry.value)
         else:
             return None
 
@@ -227,9 +508,9 @@ class ID0(Section):
 class ID1Segment:
     start: int
     end: int
-    data: bytes
+    data: Buffer
 
-    def __init__(self, start: int, end: int, data: bytes) -> None:
+    def __init__(self, start: int, end: int, data: Buffer) -> None:
         assert (end - start) * 4 == len(data), "Bad ID1 segment data length."
 
         self.start = start
@@ -249,19 +530,24 @@ class ID1(Section):
 
     def __init__(
         self,
-        file: BinaryIO,
+        file: File,
         checksum: int,
         word_size: int,
         verify_checksum: bool = False,
+        defer: bool = False,
     ) -> None:
         super().__init__(file, checksum, verify_checksum=verify_checksum)
 
-        _, file = self.decompressed(file)
-
         self.word_size = word_size
 
         self.word_format = WORD_FORMATS[self.word_size]
 
+        if not defer:
+            self.load()
+
+    def parse(self, file: File) -> None:
+        _, file = self.decompressed(file)
+
         (self.magic, self.segment_count, self.page_count) = unpack(
             "<4s4xI4xI", file.read(20)
         )
@@ -285,6 +571,8 @@ class ID1(Section):
         for start, end in segment_addresses:
             self.segments.append(ID1Segment(start, end, file.read((end - start) * 4)))
 
+        self.verify()
+
 
 class NAM(Section):
     PAGE_SIZE: int = 0x2000
@@ -299,19 +587,24 @@ class NAM(Section):
 
     def __init__(
         self,
-        file: BinaryIO,
+        file: File,
         checksum: int,
         word_size: int,
         verify_checksum: bool = False,
+        defer: bool = False,
     ) -> None:
         super().__init__(file, checksum, verify_checksum=verify_checksum)
 
-        _, file = self.decompressed(file)
-
         self.word_size = word_size
 
         self.word_format = WORD_FORMATS[self.word_size]
 
+        if not defer:
+            self.load()
+
+    def parse(self, file: File) -> None:
+        _, file = self.decompressed(file)
+
         (self.magic, self.non_empty, self.page_count, self.name_count) = unpack(
             f"<4s4xI4xI{self.word_size}xI", file.read(24 + self.word_size)
         )
@@ -329,15 +622,28 @@ class NAM(Section):
             file.read(self.name_count * self.word_size),
         )
 
+        self.verify()
+
 
 class SEG(Section):
     def __init__(
-        self, file: BinaryIO, checksum: int, verify_checksum: bool = False
+        self,
+        file: File,
+        checksum: int,
+        verify_checksum: bool = False,
+        defer: bool = False,
     ) -> None:
         super().__init__(file, checksum, verify_checksum=verify_checksum)
 
+        if not defer:
+            self.load()
+
+    def parse(self, file: File) -> None:
+        # The contents are not used, so they are never decompressed.
         _, file = self.decompressed(file)
 
+        self.verify()
+
 
 class TILFlags(IntFlag):
     ZIP: int = 0x0001
@@ -367,10 +673,18 @@ class TIL(Section):
     def_align: int
 
     def __init__(
-        self, file: BinaryIO, checksum: int, verify_checksum: bool = False
+        self,
+        file: File,
+        checksum: int,
+        verify_checksum: bool = False,
+        defer: bool = False,
     ) -> None:
         super().__init__(file, checksum, verify_checksum=verify_checksum)
 
+        if not defer:
+            self.load()
+
+    def parse(self, file: File) -> None:
         _, file = self.decompressed(file)
 
         flags: int
@@ -384,11 +698,11 @@ class TIL(Section):
 
         assert self.magic == b"IDATIL", "Bad TIL magic."
 
-        self.title = file.read(self.title_length)
+        self.title = bytes(file.read(self.title_length))
 
         (self.base_length,) = unpack("<B", file.read(1))
 
-        self.base = file.read(self.base_length)
+        self.base = bytes(file.read(self.base_length))
 
         (
             self.id,
@@ -401,17 +715,36 @@ class TIL(Section):
 
         # TODO: TIL parsing.
 
+        self.verify()
+
 
 class ID2(Section):
     def __init__(
-        self, file: BinaryIO, checksum: int, verify_checksum: bool = False
+        self,
+        file: File,
+        checksum: int,
+        verify_checksum: bool = False,
+        defer: bool = False,
     ) -> None:
         super().__init__(file, checksum, verify_checksum=verify_checksum)
 
+        if not defer:
+            self.load()
+
+    def parse(self, file: File) -> None:
+        # The contents are not used, so they are never decompressed.
         _, file = self.decompressed(file)
 
+        self.verify()
+
 
 class IDB:
+    """
+    With defer, the requested sections are only loaded when first used. Until then
+    they read from file (or its mapping), which must stay open.
+    """
+
+    mapping: Optional[mmap]
     header: Header
     id0: Optional[ID0]
     id1: Optional[ID1]
@@ -425,62 +758,202 @@ class IDB:
         file: BinaryIO,
         sections: SectionFlags = SectionFlags.ALL,
         verify_checksum: bool = False,
+        id0_mode: ID0Mode = ID0Mode.EAGER,
+        page_cache_size: int = DEFAULT_PAGE_CACHE_SIZE,
+        memory_map: bool = False,
+        threads: int = 1,
+        defer: bool = False,
     ) -> None:
-        self.header = Header(file)
+        file_: File
+        if memory_map:
+            # Pages, keys and values become views of the mapping instead of copies.
+            self.mapping = mmap(file.fileno(), 0, access=ACCESS_READ)
+            file_ = MemoryFile(self.mapping)
+        else:
+            self.mapping = None
+            file_ = file
+
+        self.header = Header(file_)
+
+        word_size: int = WORD_SIZES[self.header.magic]
+
+        # Each thread needs a view of the file with a position of its own, so other
+        # files (like pipes) are decoded on this one.
+        descriptor: Optional[int] = None
+        if self.mapping is None and not isinstance(file, BytesIO):
+            descriptor = positional_descriptor(file)
+
+            if descriptor is None:
+                threads = 1
+
+        # Sections sit at independent offsets, so they can be decoded at the same time.
+        # Decompression and checksumming release the GIL.
+        executor: Optional[ThreadPoolExecutor] = None
+        if threads > 1:
+            executor = ThreadPoolExecutor(threads)
+
+        def load(offset: int, loader: Callable[[File], S]) -> "Future[S]":
+            future: Future[S]
+            if executor is None:
+                future = Future()
+                file_.seek(offset, 0)
+                future.set_result(loader(file_))
+            else:
+                future = executor.submit(
+                    lambda: loader(self.section_file(file, descriptor, offset))
+                )
+
+            return future
 
+        id0: Optional[Future[ID0]] = None
         if self.header.id0_offset != 0 and sections & SectionFlags.ID0:
-            file.seek(self.header.id0_offset, 0)
-            self.id0 = ID0(
-                file,
-                self.header.id0_checksum,
-                WORD_SIZES[self.header.magic],
-                verify_checksum=verify_checksum,
+            id0 = load(
+                self.header.id0_offset,
+                lambda section_file: ID0(
+                    section_file,
+                    self.header.id0_checksum,
+                    word_size,
+                    verify_checksum=verify_checksum,
+                    defer=defer,
+                    mode=id0_mode,
+                    page_cache_size=page_cache_size,
+                ),
             )
-        else:
-            self.id0 = None
 
+        id1: Optional[Future[ID1]] = None
         if self.header.id1_offset != 0 and sections & SectionFlags.ID1:
-            file.seek(self.header.id1_offset, 0)
-            self.id1 = ID1(
-                file,
-                self.header.id1_checksum,
-                WORD_SIZES[self.header.magic],
-                verify_checksum=verify_checksum,
+            id1 = load(
+                self.header.id1_offset,
+                lambda section_file: ID1(
+                    section_file,
+                    self.header.id1_checksum,
+                    word_size,
+                    verify_checksum=verify_checksum,
+                    defer=defer,
+                ),
             )
-        else:
-            self.id1 = None
 
+        nam: Optional[Future[NAM]] = None
         if self.header.nam_offset != 0 and sections & SectionFlags.NAM:
-            file.seek(self.header.nam_offset, 0)
-            self.nam = NAM(
-                file,
-                self.header.nam_checksum,
-                WORD_SIZES[self.header.magic],
-                verify_checksum=verify_checksum,
+            nam = load(
+                self.header.nam_offset,
+                lambda section_file: NAM(
+                    section_file,
+                    self.header.nam_checksum,
+                    word_size,
+                    verify_checksum=verify_checksum,
+                    defer=defer,
+                ),
             )
-        else:
-            self.nam = None
 
+        seg: Optional[Future[SEG]] = None
         if self.header.seg_offset != 0 and sections & SectionFlags.SEG:
-            file.seek(self.header.seg_offset, 0)
-            self.seg = SEG(
-                file, self.header.seg_checksum, verify_checksum=verify_checksum
+            seg = load(
+                self.header.seg_offset,
+                lambda section_file: SEG(
+                    section_file,
+                    self.header.seg_checksum,
+                    verify_checksum=verify_checksum,
+                    defer=defer,
+                ),
             )
-        else:
-            self.seg = None
 
+        til: Optional[Future[TIL]] = None
         if self.header.til_offset != 0 and sections & SectionFlags.TIL:
-            file.seek(self.header.til_offset, 0)
-            self.til = TIL(
-                file, self.header.til_checksum, verify_checksum=verify_checksum
+            til = load(
+                self.header.til_offset,
+                lambda section_file: TIL(
+                    section_file,
+                    self.header.til_checksum,
+                    verify_checksum=verify_checksum,
+                    defer=defer,
+                ),
             )
-        else:
-            self.til = None
 
+        id2: Optional[Future[ID2]] = None
         if self.header.id2_offset != 0 and sections & SectionFlags.ID2:
-            file.seek(self.header.id2_offset, 0)
-            self.id2 = ID2(
-                file, self.header.id2_checksum, verify_checksum=verify_checksum
+            id2 = load(
+                self.header.id2_offset,
+                lambda section_file: ID2(
+                    section_file,
+                    self.header.id2_checksum,
+                    verify_checksum=verify_checksum,
+                    defer=defer,
+                ),
             )
+
+        try:
+            self.id0 = None if id0 is None else id0.result()
+            self.id1 = None if id1 is None else id1.result()
+            self.nam = None if nam is None else nam.result()
+            self.seg = None if seg is None else seg.result()
+            self.til = None if til is None else til.result()
+            self.id2 = None if id2 is None else id2.result()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def __enter__(self) -> "IDB":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        try:
+            self.close()
+        except BufferError:
+            # The traceback can hold views of the mapping, which must not hide the
+            # exception. The mapping is closed once they are released.
+            if exception is None:
+                raise
+
+    def close(self) -> None:
+        """
+        Releases the sections and closes the mapping. The file belongs to the caller,
+        who closes it. Views of the mapping that are still held elsewhere keep it from
+        closing (with a BufferError), so copy what is needed beyond the IDB first.
+        """
+
+        self.id0 = None
+        self.id1 = None
+        self.nam = None
+        self.seg = None
+        self.til = None
+        self.id2 = None
+
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                # Lazy pages and their cache refer to each other, so their views are
+                # only released once the cycle is collected.
+                collect()
+
+                self.mapping.close()
+
+            self.mapping = None
+
+    def section_file(
+        self, file: BinaryIO, descriptor: Optional[int], offset: int
+    ) -> File:
+        """
+        Returns a file positioned at offset that does not share its position with file.
+        No new handles are opened, so there are none to close.
+        """
+
+        section_file: File
+        if self.mapping is not None:
+            section_file = MemoryFile(self.mapping)
+        elif isinstance(file, BytesIO):
+            section_file = MemoryFile(file.getbuffer())
         else:
-            self.id2 = None
+            assert descriptor is not None, "UNEXPECTED"
+
+            section_file = PositionalFile(file, descriptor)
+
+        section_file.seek(offset, 0)
+
+        return section_file
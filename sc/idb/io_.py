@@ -0,0 +1,341 @@
+from mmap import mmap
+from stat import S_ISREG
+from typing import BinaryIO, Optional, Union
+
+import os
+import zlib
+
+# Data read from an IDB. Either a copy or a view of the underlying buffer.
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class MemoryFile:
+    """
+    A read-only file over a buffer (such as an mmap).
+    Reads return memoryview slices of the buffer rather than copies.
+    """
+
+    data: memoryview
+    position: int
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, mmap]) -> None:
+        self.data = memoryview(data)
+        self.position = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def read(self, size: int = -1) -> memoryview:
+        start: int = self.position
+
+        if size < 0:
+            self.position = len(self.data)
+        else:
+            self.position = min(start + size, len(self.data))
+
+        return self.data[start : self.position]
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 0:
+            position = offset
+        elif whence == 1:
+            position = self.position + offset
+        elif whence == 2:
+            position = len(self.data) + offset
+        else:
+            raise ValueError("Invalid whence.")
+
+        if position < 0:
+            raise ValueError("Negative seek position.")
+
+        self.position = position
+
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+class PositionalFile:
+    """
+    A read-only file over the descriptor of a regular file, read with pread so it
+    neither shares nor moves the position of the file the descriptor belongs to.
+    The file is referenced so it is not closed (by being collected) while in use.
+    """
+
+    file: BinaryIO
+    descriptor: int
+    position: int
+
+    def __init__(self, file: BinaryIO, descriptor: int) -> None:
+        self.file = file
+        self.descriptor = descriptor
+        self.position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            size = max(os.fstat(self.descriptor).st_size - self.position, 0)
+
+        # Large reads can come back short, so are continued until the end of the file.
+        chunks: list[bytes] = []
+        length: int = 0
+        chunk: bytes
+        while length < size:
+            chunk = os.pread(self.descriptor, size - length, self.position + length)
+
+            if len(chunk) == 0:
+                break
+
+            chunks.append(chunk)
+            length += len(chunk)
+
+        self.position += length
+
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 0:
+            position = offset
+        elif whence == 1:
+            position = self.position + offset
+        elif whence == 2:
+            position = os.fstat(self.descriptor).st_size + offset
+        else:
+            raise ValueError("Invalid whence.")
+
+        if position < 0:
+            raise ValueError("Negative seek position.")
+
+        self.position = position
+
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+def positional_descriptor(file: BinaryIO) -> Optional[int]:
+    """
+    The descriptor of a file if it can be read with pread, i.e. it is a regular file
+    (not a pipe or an in-memory file) and pread is available.
+    """
+
+    if not hasattr(os, "pread"):
+        return None
+
+    descriptor: int
+    try:
+        descriptor = file.fileno()
+
+        if not S_ISREG(os.fstat(descriptor).st_mode):
+            return None
+    except (AttributeError, OSError, ValueError):  # UnsupportedOperation included.
+        return None
+
+    return descriptor
+
+
+class ChecksumFile:
+    """
+    A read-only file over a section that computes the CRC32 of the section as it is
+    read, so verifying the checksum does not need a separate pass.
+    Until the checksum is finished, reads must be sequential and seeks forwards.
+    Positions are those of the underlying file.
+    """
+
+    CHUNK_SIZE: int = 0x10000
+
+    file: "File"
+    start: int
+    end: int
+    position: int
+    crc: int
+    finished: bool
+
+    def __init__(self, file: "File", length: int) -> None:
+        self.file = file
+        self.start = file.tell()
+        self.end = self.start + length
+        self.position = self.start
+        self.crc = 0
+        self.finished = False
+
+    def read(self, size: int = -1) -> Buffer:
+        if size < 0 or self.position + size > self.end:
+            size = max(self.end - self.position, 0)
+
+        # Other sections may have moved the underlying file in the meantime.
+        self.file.seek(self.position, 0)
+
+        data: Buffer = self.file.read(size)
+
+        if not self.finished:
+            self.crc = zlib.crc32(data, self.crc)
+
+        self.position += len(data)
+
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 0:
+            position = offset
+        elif whence == 1:
+            position = self.position + offset
+        elif whence == 2:
+            position = self.end + offset
+        else:
+            raise ValueError("Invalid whence.")
+
+        if self.finished:
+            self.position = position
+        elif position < self.position:
+            raise ValueError("Sections can only be read forwards while checksumming.")
+        else:
+            # Skipped data still counts towards the checksum.
+            while self.position < min(position, self.end):
+                if len(self.read(min(position, self.end) - self.position)) == 0:
+                    break
+
+            self.position = position
+
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def finish(self) -> int:
+        """
+        Checksums the rest of the section and returns the CRC32 of all of it.
+        """
+
+        while not self.finished and self.position < self.end:
+            if len(self.read(min(self.CHUNK_SIZE, self.end - self.position))) == 0:
+                raise EOFError("Section is truncated.")
+
+        self.finished = True
+
+        return self.crc
+
+
+class ZlibFile:
+    """
+    A read-only file over a zlib stream that is decompressed as it is read.
+    Only a chunk of compressed and a chunk of decompressed data are held at a time.
+    Seeking is only supported in the forwards direction.
+    """
+
+    CHUNK_SIZE: int = 0x10000
+
+    file: "File"
+    compressed_offset: int
+    compressed_remaining: int
+    decompressor: "zlib._Decompress"
+    output: bytes
+    output_offset: int
+    position: int
+
+    def __init__(self, file: "File", compressed_length: int) -> None:
+        self.file = file
+        self.compressed_offset = file.tell()
+        self.compressed_remaining = compressed_length
+        self.decompressor = zlib.decompressobj()
+        self.output = b""
+        self.output_offset = 0
+        self.position = 0
+
+    def fill(self) -> bool:
+        """
+        Decompresses the next chunk (of at most CHUNK_SIZE bytes) into the output.
+        Returns False once the stream is exhausted.
+        """
+
+        data: Buffer
+        while True:
+            # Input left over from a chunk that decompressed to more than fits.
+            if len(self.decompressor.unconsumed_tail) != 0:
+                data = self.decompressor.unconsumed_tail
+            elif self.compressed_remaining > 0:
+                # Other sections may have moved the underlying file in the meantime.
+                self.file.seek(self.compressed_offset, 0)
+
+                data = self.file.read(min(self.CHUNK_SIZE, self.compressed_remaining))
+
+                if len(data) == 0:
+                    raise EOFError("Compressed section is truncated.")
+
+                self.compressed_offset += len(data)
+                self.compressed_remaining -= len(data)
+            else:
+                break
+
+            self.output = self.decompressor.decompress(data, self.CHUNK_SIZE)
+            self.output_offset = 0
+
+            if len(self.output) != 0:
+                return True
+
+        self.output = self.decompressor.flush()
+        self.output_offset = 0
+
+        return len(self.output) != 0
+
+    def read(self, size: int = -1) -> Buffer:
+        data: Union[bytes, bytearray]
+        if size < 0:
+            # A bytearray is grown in place, so the result is never held twice.
+            data = bytearray(self.output[self.output_offset :])
+
+            while self.fill():
+                data += self.output
+
+            self.output = b""
+            self.output_offset = 0
+        else:
+            chunks: list[bytes] = []
+            length: int = 0
+            end: int
+            while length < size:
+                if self.output_offset == len(self.output) and not self.fill():
+                    break
+
+                end = min(len(self.output), self.output_offset + (size - length))
+
+                if self.output_offset == 0 and end == len(self.output):
+                    chunks.append(self.output)
+                else:
+                    chunks.append(self.output[self.output_offset : end])
+
+                length += end - self.output_offset
+                self.output_offset = end
+
+            data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+        self.position += len(data)
+
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 0:
+            offset -= self.position
+        elif whence != 1:
+            raise ValueError("Invalid whence.")
+
+        if offset < 0:
+            raise ValueError("Compressed sections can only be read forwards.")
+
+        skipped: int
+        while offset > 0:
+            skipped = len(self.read(min(offset, self.CHUNK_SIZE)))
+
+            if skipped == 0:
+                break
+
+            offset -= skipped
+
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+File = Union[BinaryIO, MemoryFile, PositionalFile, ChecksumFile, ZlibFile]
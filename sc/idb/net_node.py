@@ -1,11 +1,15 @@
-from struct import calcsize, pack, unpack
-from typing import Any, Generator, Optional, Union
+from struct import Struct, calcsize, error as StructError
+from typing import Any, Callable, Generator, Iterable, Optional, Union
 
 from sc.idb.btree.python import Entry
-from sc.idb.idb import ID0
+from sc.idb.idb import ID0, WORD_FORMATS, prefix_end
+from sc.idb.io_ import Buffer
+from sc.util import LRUCache
 
+DEFAULT_NET_NODE_CACHE_SIZE: int = 1024
 
-def unpack_t(data: bytes, offset: int) -> tuple[int, int]:
+
+def unpack_t(data: Buffer, offset: int) -> tuple[int, int]:
     """
     Unpacks up to a two byte value.
     The number of bytes used is one more than the number of proceeding ones.
@@ -21,7 +25,7 @@ def unpack_t(data: bytes, offset: int) -> tuple[int, int]:
         return first_byte, 1
 
 
-def unpack_u(data: bytes, offset: int) -> tuple[int, int]:
+def unpack_u(data: Buffer, offset: int) -> tuple[int, int]:
     """
     Unpacks up to a four byte value.
     The number of bytes used is one or two more than the number of proceeding ones.
@@ -43,7 +47,7 @@ def unpack_u(data: bytes, offset: int) -> tuple[int, int]:
         return first_byte, 1
 
 
-def unpack_v(data: bytes, offset: int) -> tuple[int, int]:
+def unpack_v(data: Buffer, offset: int) -> tuple[int, int]:
     """
     Unpacks up to an eight byte value.
     Represented as two consecutive Us.
@@ -60,20 +64,190 @@ def unpack_v(data: bytes, offset: int) -> tuple[int, int]:
     return (upper_result << 32) + lower_result, upper_size + lower_size
 
 
+# A struct and its native size for regular specifiers, or a function and sign bit
+# (zero when unsigned) for each custom value.
+DecoderStep = tuple[
+    Optional[Struct], Optional[Callable[[Buffer, int], tuple[int, int]]], int
+]
+
+
+class Decoder:
+    """
+    A NetNode.unpack format compiled for a word size, so it is only parsed once.
+    Errors in the format are raised when decoding reaches them, as they used to be.
+    """
+
+    steps: list[DecoderStep]
+    error: Optional[tuple[type[Exception], str]]
+
+    def __init__(self, format_: str, word_size: int) -> None:
+        self.steps = []
+        self.error = None
+
+        repeat_count: int = 0
+
+        struct: Struct
+        unpack_custom: Callable[[Buffer, int], tuple[int, int]]
+        bits: int
+        index: int
+        value: str
+        for index, value in enumerate(format_):
+            if index == 0 and value in "<>":
+                # Regular specifiers have always been unpacked as big endian anyway.
+                continue
+
+            if value in "0123456789":
+                repeat_count *= 10
+                repeat_count += int(value)
+
+                continue
+
+            if repeat_count == 0:
+                repeat_count = 1
+
+            if value in "xcbB?hHiIlLqQnNefdspP":  # Regular format specifiers.
+                try:
+                    struct = Struct(f">{repeat_count}{value}")
+                except StructError as exception:
+                    self.error = (StructError, str(exception))
+                    break
+
+                self.steps.append((struct, None, calcsize(f"{repeat_count}{value}")))
+            elif value in "TUVWtuvw":  # Custom format specifiers.
+                if value.upper() == "T":
+                    unpack_custom, bits = unpack_t, 16
+                elif value.upper() == "U" or (value.upper() == "W" and word_size == 4):
+                    unpack_custom, bits = unpack_u, 32
+                elif value.upper() == "V" or (value.upper() == "W" and word_size == 8):
+                    unpack_custom, bits = unpack_v, 64
+                else:
+                    assert False, "UNEXPECTED"
+
+                self.steps += [
+                    (None, unpack_custom, (1 << (bits - 1)) if value.islower() else 0)
+                ] * repeat_count
+            else:
+                self.error = (
+                    ValueError,
+                    f"""Invalid character "{value}" at index {index} in format.""",
+                )
+                break
+
+            repeat_count = 0
+
+    def decode(self, data: Buffer) -> tuple[list[Any], int]:
+        """
+        Returns the unpacked values and the number of bytes used.
+        """
+
+        results: list[Any] = []
+        offset: int = 0
+
+        struct: Optional[Struct]
+        unpack_custom: Optional[Callable[[Buffer, int], tuple[int, int]]]
+        argument: int
+        result: int
+        size: int
+        for struct, unpack_custom, argument in self.steps:
+            if unpack_custom is not None:
+                result, size = unpack_custom(data, offset)
+
+                if result & argument:  # Negative.
+                    result -= argument << 1
+
+                results.append(result)
+                offset += size
+            else:
+                assert struct is not None, "UNEXPECTED"
+
+                if struct.size == argument:
+                    results += struct.unpack_from(data, offset)
+                else:
+                    # Native and standard sizes differ (like l), which only unpacks
+                    # when the data runs out, but is kept as it always was.
+                    results += struct.unpack(data[offset : offset + argument])
+
+                offset += argument
+
+        if self.error is not None:
+            raise self.error[0](self.error[1])
+
+        return results, offset
+
+
+def join(values: list[Buffer]) -> Buffer:
+    """
+    Joins the values of consecutive records, copying them once into a buffer of the full
+    size. A single value is returned as is.
+    """
+
+    if len(values) == 1:
+        return values[0]
+
+    joined: bytearray = bytearray(sum(len(value) for value in values))
+    offset: int = 0
+    value: Buffer
+    for value in values:
+        joined[offset : offset + len(value)] = value
+        offset += len(value)
+
+    return joined
+
+
+DECODERS: dict[tuple[str, int], Decoder] = {}
+
+
+def decoder(format_: str, word_size: int) -> Decoder:
+    """
+    Compiles a format on first use, then returns the same decoder.
+    """
+
+    key: tuple[str, int] = (format_, word_size)
+
+    if key not in DECODERS:
+        DECODERS[key] = Decoder(format_, word_size)
+
+    return DECODERS[key]
+
+
+class KeyCodec:
+    """
+    Precompiled structs for the node keys of a word size.
+    """
+
+    node: Struct  # Dot, node ID.
+    tag: Struct  # Dot, node ID, tag.
+    index: Struct  # Dot, node ID, tag, index.
+    signed_index: Struct
+
+    def __init__(self, word_format: str) -> None:
+        self.node = Struct(f">c{word_format}")
+        self.tag = Struct(f">c{word_format}c")
+        self.index = Struct(f">c{word_format}c{word_format}")
+        self.signed_index = Struct(f">c{word_format}c{word_format.lower()}")
+
+
+KEY_CODECS: dict[int, KeyCodec] = {
+    word_size: KeyCodec(word_format) for word_size, word_format in WORD_FORMATS.items()
+}
+
+
 class NetNode:
     id0: ID0
+    key_codec: KeyCodec
     node_id: int
     node_base: int
 
     def __init__(self, id0: ID0, node_id: Union[int, bytes]) -> None:
         self.id0 = id0
+        self.key_codec = KEY_CODECS[self.id0.word_size]
 
         if isinstance(node_id, int):
             self.node_id = node_id
         elif isinstance(node_id, bytes):
             key: bytes = b"N" + node_id
 
-            entry: Optional[Entry] = self.id0.root_page.search(
+            entry: Optional[Entry] = self.id0.search(
                 min_=key, max_=key, min_inclusive=True, max_inclusive=True, lowest=True
             )
 
@@ -88,23 +262,11 @@ class NetNode:
 
     def make_key(self, tag: bytes, index: Optional[int] = None) -> bytes:
         if index is None:
-            return pack(f">c{self.id0.word_format}c", b".", self.node_id, tag)
+            return self.key_codec.tag.pack(b".", self.node_id, tag)
         elif index < 0:
-            return pack(
-                f">c{self.id0.word_format}c{self.id0.word_format.lower()}",
-                b".",
-                self.node_id,
-                tag,
-                index,
-            )
+            return self.key_codec.signed_index.pack(b".", self.node_id, tag, index)
         else:
-            return pack(
-                f">c{self.id0.word_format}c{self.id0.word_format}",
-                b".",
-                self.node_id,
-                tag,
-                index,
-            )
+            return self.key_codec.index.pack(b".", self.node_id, tag, index)
 
     def break_key(
         self, key: bytes, signed: bool = False
@@ -113,17 +275,13 @@ class NetNode:
         node_id: int
         tag: bytes
         index: Optional[int]
-        if len(key) == 2 + self.id0.word_size:
-            dot, node_id, tag = unpack(f">c{self.id0.word_format}c", key)
+        if len(key) == self.key_codec.tag.size:
+            dot, node_id, tag = self.key_codec.tag.unpack(key)
             index = None
-        elif len(key) == 2 + (self.id0.word_size * 2) and signed:
-            dot, node_id, tag, index = unpack(
-                f">c{self.id0.word_format}c{self.id0.word_format.lower()}", key
-            )
-        elif len(key) == 2 + (self.id0.word_size * 2):
-            dot, node_id, tag, index = unpack(
-                f">c{self.id0.word_format}c{self.id0.word_format}", key
-            )
+        elif len(key) == self.key_codec.index.size and signed:
+            dot, node_id, tag, index = self.key_codec.signed_index.unpack(key)
+        elif len(key) == self.key_codec.index.size:
+            dot, node_id, tag, index = self.key_codec.index.unpack(key)
         else:
             raise KeyError("Invalid key size.")
 
@@ -150,19 +308,19 @@ class NetNode:
     def name(self) -> bytes:
         key: bytes = self.make_key(b"N")
 
-        entry: Optional[Entry] = self.id0.root_page.search(
+        entry: Optional[Entry] = self.id0.search(
             min_=key, max_=key, min_inclusive=True, max_inclusive=True, lowest=True
         )
 
         if entry is None:
             raise KeyError("Name does not exist.")
         else:
-            return entry.value
+            return bytes(entry.value)
 
     def entry(self, tag: bytes, index: int) -> Entry:
         key: bytes = self.make_key(tag, index=index)
 
-        entry: Optional[Entry] = self.id0.root_page.search(
+        entry: Optional[Entry] = self.id0.search(
             min_=key, max_=key, min_inclusive=True, max_inclusive=True, lowest=True
         )
 
@@ -171,28 +329,100 @@ class NetNode:
         else:
             return entry
 
-    def entries(self, tag: bytes) -> Generator[Entry, None, None]:
+    def tag_range(self, tag: bytes) -> tuple[bytes, Optional[bytes]]:
+        """
+        The range (start inclusive, stop exclusive) of the keys with an index for a tag.
+        """
+
         first_key: bytes = self.make_key(tag)
-        key = first_key
-
-        while True:
-            entry: Optional[Entry] = self.id0.root_page.search(
-                min_=key,
-                max_=None,
-                min_inclusive=False,
-                max_inclusive=True,
-                lowest=True,
-            )
 
-            if entry is None or not entry.key.startswith(first_key):
+        # Keys with an index are longer than the key of the tag itself.
+        return first_key + b"\x00", prefix_end(first_key)
+
+    def entries(self, tag: bytes) -> Generator[Entry, None, None]:
+        start: bytes
+        stop: Optional[bytes]
+        start, stop = self.tag_range(tag)
+
+        yield from self.id0.scan(start=start, stop=stop)
+
+    def blob(self, tag: bytes, start: int = 0) -> Buffer:
+        """
+        Reassembles a value that spans the records of consecutive indexes from start.
+        A value in a single record is returned as is, otherwise the records are copied
+        once into a buffer of the full size.
+        """
+
+        return self.assemble_blob(
+            tag,
+            self.id0.scan(start=self.make_key(tag, start), prefix=self.make_key(tag)),
+            start=start,
+        )
+
+    def assemble_blob(
+        self, tag: bytes, entries: Iterable[Entry], start: int = 0
+    ) -> Buffer:
+        """
+        Reassembles a blob as in blob, from entries already read in key order (such as
+        those fed to an extractor). Entries before the blob's first record are skipped.
+        """
+
+        start_key: bytes = self.make_key(tag, start)
+
+        values: list[Buffer] = []
+        index: int = start
+        entry: Entry
+        for entry in entries:
+            if len(values) == 0 and entry.key < start_key:
+                continue
+
+            if entry.key != self.make_key(tag, index):
                 break
 
-            yield entry
+            values.append(entry.value)
+            index += 1
+
+        if len(values) == 0:
+            raise KeyError(f"Blob for tag {tag!r} at {start} does not exist.")
 
-            key = entry.key
+        return join(values)
+
+    def items(
+        self, signed: bool = False
+    ) -> Generator[tuple[bytes, Union[int, bytes, None], Buffer], None, None]:
+        """
+        Yields the tag, index and value of every entry of the node in one scan.
+        Indexes are decoded as in break_key, except that keys of any other length (like
+        those of hashvals) have the rest of the key as their index.
+        """
+
+        prefix: bytes = self.key_codec.node.pack(b".", self.node_id)
+        tag_size: int = self.key_codec.tag.size
+        index_size: int = self.key_codec.index.size
+        index_struct: Struct = (
+            self.key_codec.signed_index if signed else self.key_codec.index
+        )
+
+        tag: bytes
+        index: Union[int, bytes, None]
+        entry: Entry
+        for entry in self.id0.scan(prefix=prefix):
+            if len(entry.key) < tag_size:
+                continue
+
+            tag = entry.key[tag_size - 1 : tag_size]
+
+            if len(entry.key) == tag_size:
+                index = None
+            elif len(entry.key) == index_size:
+                index = index_struct.unpack(entry.key)[3]
+            else:
+                index = entry.key[tag_size:]
+
+            yield tag, index, entry.value
 
     def unpack(
-        self, format_: str, data: bytes, return_offset: bool = False
+        self, format_: str, data: Buffer, return_offset: bool = False
     ) -> tuple[Any, ...]:
         """
         Extends regular unpack to support IDA's proprietary packing mechanism.
@@ -204,94 +434,89 @@ class NetNode:
         - W: Up to a word-size-byte value.
         """
 
-        big_endian: bool = True
-        repeat_count: int = 0
-        offset: int = 0
-        results: list[Any] = []
+        results: list[Any]
+        offset: int
+        results, offset = decoder(format_, self.id0.word_size).decode(data)
 
-        size: int
-        index: int
-        value: str
-        for index, value in enumerate(format_):
-            if index == 0 and value in "<>":
-                if value == "<":
-                    big_endian = False
+        if return_offset:
+            results.append(offset)
 
-                continue
+        return tuple(results)
 
-            if value in "0123456789":
-                repeat_count *= 10
-                repeat_count += int(value)
 
-                continue
+class NetNodeGenerator:
+    MAXIMUM_SKIPPED: int = 8
 
-            if repeat_count == 0:
-                repeat_count = 1
+    id0: ID0
+    net_nodes: LRUCache[Union[int, bytes], NetNode]  # By node ID and by name.
 
-            if value in "xcbB?hHiIlLqQnNefdspP":  # Regular format specifiers.
-                size = calcsize(f"{repeat_count}{value}")
+    def __init__(self, id0: ID0, cache_size: int = DEFAULT_NET_NODE_CACHE_SIZE) -> None:
+        self.id0 = id0
+        self.net_nodes = LRUCache(cache_size)
 
-                if big_endian:
-                    results += unpack(
-                        f">{repeat_count}{value}", data[offset : offset + size]
-                    )
-                else:
-                    results += unpack(
-                        f">{repeat_count}{value}", data[offset : offset + size]
-                    )
+    def net_node(self, node_id: Union[int, bytes]) -> NetNode:
+        net_node: Optional[NetNode] = self.net_nodes.get(node_id)
 
-                offset += size
-            elif value in "TUVWtuvw":  # Custom format specifiers.
-                result: int
-                for _ in range(repeat_count):
-                    if value.upper() == "T":
-                        result, size = unpack_t(data, offset)
-                        result = int.from_bytes(
-                            result.to_bytes(2, "big", signed=False),
-                            "big",
-                            signed=value.islower(),
-                        )
-                    elif value.upper() == "U" or (
-                        value.upper() == "W" and self.id0.word_size == 4
-                    ):
-                        result, size = unpack_u(data, offset)
-                        result = int.from_bytes(
-                            result.to_bytes(4, "big", signed=False),
-                            "big",
-                            signed=value.islower(),
-                        )
-                    elif value.upper() == "V" or (
-                        value.upper() == "W" and self.id0.word_size == 8
-                    ):
-                        result, size = unpack_v(data, offset)
-                        result = int.from_bytes(
-                            result.to_bytes(8, "big", signed=False),
-                            "big",
-                            signed=value.islower(),
-                        )
-                    else:
-                        assert False, "UNEXPECTED"
-
-                    results.append(result)
-                    offset += size
-            else:
-                raise ValueError(
-                    f"""Invalid character "{value}" at index {index} in format."""
-                )
+        if net_node is None:
+            net_node = NetNode(self.id0, node_id)
 
-            repeat_count = 0
+            self.net_nodes[node_id] = net_node
 
-        if return_offset:
-            results.append(offset)
+            if isinstance(node_id, bytes):
+                self.net_nodes[net_node.node_id] = net_node
 
-        return tuple(results)
+        return net_node
 
+    def names(self, node_ids: Iterable[int]) -> dict[int, bytes]:
+        """
+        Looks up the names of many nodes in a merge pass over the ID0, rather than a
+        search per node. Nodes without a name are left out.
+        Once gaps too long to walk outnumber the names found by walking, the nodes are
+        sparse and the rest are searched for one at a time, as single lookups are.
+        """
 
-class NetNodeGenerator:
-    id0: ID0
+        key_struct: Struct = KEY_CODECS[self.id0.word_size].tag
 
-    def __init__(self, id0: ID0) -> None:
-        self.id0 = id0
+        keys: list[tuple[bytes, int]] = sorted(
+            (key_struct.pack(b".", node_id, b"N"), node_id) for node_id in set(node_ids)
+        )
 
-    def net_node(self, node_id: Union[int, bytes]) -> NetNode:
-        return NetNode(self.id0, node_id)
+        names: dict[int, bytes] = {}
+
+        entries: Optional[Generator[Entry, None, None]] = None
+        entry: Optional[Entry] = None
+        walked: int = 0  # Names found by walking from the previous key.
+        gaps: int = 0  # Walks that gave up on a long gap.
+
+        key: bytes
+        node_id: int
+        skipped: int
+        for key, node_id in keys:
+            if entries is not None:
+                skipped = 0
+                while entry is not None and entry.key < key:
+                    # Searching again is cheaper than walking a long gap.
+                    if skipped == self.MAXIMUM_SKIPPED:
+                        entries = None
+                        gaps += 1
+                        break
+
+                    entry = next(entries, None)
+                    skipped += 1
+                else:
+                    if entry is not None and entry.key == key:
+                        names[node_id] = bytes(entry.value)
+                        walked += 1
+
+                    continue
+
+            if gaps > walked:
+                entry = self.id0.search(key, key, True, True)
+            else:
+                entries = self.id0.iterate(min_=key)
+                entry = next(entries, None)
+
+            if entry is not None and entry.key == key:
+                names[node_id] = bytes(entry.value)
+
+        return names
@@ -0,0 +1,338 @@
+from io import BytesIO
+from random import Random
+from typing import Dict
+
+from sc.elf import section_indices
+from sc.elf.constants import SHFlags, SHType, STBind, STType, STVisibility
+from sc.elf.elf import (
+    ELF,
+    StringTableSection,
+    SymbolTableEntry,
+    SymbolTableSection,
+)
+from sc.structures import Section, SectionFlags
+
+
+def new_string_table(merge_tails: bool = False) -> StringTableSection:
+    return StringTableSection(
+        name=b".strtab",
+        type_=SHType.SHT_STRTAB,
+        flags=SHFlags.SHF_ALLOC,
+        address=0,
+        link=0,
+        info=0,
+        alignment=1,
+        entry_size=0,
+        merge_tails=merge_tails,
+    )
+
+
+def test_string_table():
+    random = Random(0)
+
+    string_table = new_string_table()
+
+    strings = [
+        bytes(random.choice(b"abc_") for _ in range(random.randint(0, 6)))
+        for _ in range(2000)
+    ]
+
+    # Searching the table, whole strings and tails of longer ones are reused.
+    data = bytearray()
+    offsets: Dict[bytes, int] = {}
+    for string in strings:
+        offset = data.find(string + b"\x00")
+        if offset < 0:
+            offset = len(data)
+            data += string + b"\x00"
+
+        assert string_table.offset_or_append(string) == offset
+        assert offsets.setdefault(string, offset) == offset
+        assert string_table.string(offset) == string
+        assert string_table.offset(string) == offset
+
+    assert string_table.to_bytes() == data
+
+    offset = string_table.append(b"foobar")
+
+    assert string_table.offset(b"bar") == offset + 3
+    assert string_table.offset_or_append(b"obar") == offset + 2
+    assert len(string_table.to_bytes()) == offset + 7
+
+    string_table.append(b"baz")
+
+    assert string_table.offset(b"bar\x00baz") == offset + 3
+
+    try:
+        string_table.offset(b"missing")
+    except ValueError:
+        pass
+    else:
+        assert False, "Missing string was found."
+
+
+def test_string_table_merge_tails():
+    random = Random(0)
+
+    strings = [
+        bytes(random.choice(b"ab_") for _ in range(random.randint(0, 8)))
+        for _ in range(3000)
+    ] + [b"module_init", b"init", b"it", b"module_init"]
+
+    plain = new_string_table()
+
+    assert plain.extend(strings) == 0
+
+    string_table = new_string_table(merge_tails=True)
+    string_table.append(b"first")
+
+    saved_size = string_table.extend(strings)
+
+    assert saved_size > 0
+    assert string_table.saved_size == saved_size
+    assert len(string_table.to_bytes()) < len(plain.to_bytes())
+
+    for string in strings:
+        assert string_table.string(string_table.offset_or_append(string)) == string
+
+    assert string_table.offset(b"init") == string_table.offset(b"module_init") + 7
+
+    # Nothing more to add or save.
+    assert string_table.extend(strings) == 0
+    assert string_table.saved_size == saved_size
+
+
+def test_elf_round_trip():
+    random = Random(0)
+
+    elf = ELF(undefined_section=True)
+
+    symbol_table = SymbolTableSection(
+        name=b".symtab",
+        type_=SHType.SHT_SYMTAB,
+        flags=SHFlags.SHF_ALLOC,
+        address=0,
+        link=0,
+        info=0,
+        alignment=1,
+        entry_size=0,
+    )
+
+    names = [
+        random.choice((b"", b"module_", b"driver_"))
+        + f"init_{random.randrange(500)}".encode()
+        for _ in range(1000)
+    ]
+
+    for index, name in enumerate(names):
+        symbol_table.entries.append(
+            SymbolTableEntry(
+                name=name,
+                binding=STBind.STB_LOCAL,
+                type_=STType.STT_FUNC,
+                visibility=STVisibility.STV_DEFAULT,
+                section_index=0,
+                value=index * 0x10,
+                size=0,
+            )
+        )
+
+    elf.sections.append(symbol_table)
+
+    for _64_bit in (False, True):
+        for big_endian in (False, True):
+            merged = elf.to_bytes(_64_bit, big_endian, merge_string_tails=True)
+
+            del elf.sections[2:]
+
+            data = elf.to_bytes(_64_bit, big_endian)
+
+            assert len(merged) < len(data)
+
+            merged_symbol_table = ELF(file=BytesIO(merged)).sections[1]
+
+            assert isinstance(merged_symbol_table, SymbolTableSection)
+            assert [
+                (entry.name, entry.value) for entry in merged_symbol_table.entries
+            ] == [(name, index * 0x10) for index, name in enumerate(names)]
+
+            parsed = ELF(file=BytesIO(data))
+
+            assert [section.name for section in parsed.sections] == [
+                b"",
+                b".symtab",
+                b".shstrtab",
+                b".strtab",
+            ]
+
+            parsed_symbol_table = parsed.sections[1]
+
+            assert isinstance(parsed_symbol_table, SymbolTableSection)
+            assert [
+                (entry.name, entry.value) for entry in parsed_symbol_table.entries
+            ] == [(name, index * 0x10) for index, name in enumerate(names)]
+
+            # Written again, the tables are the same.
+            assert parsed.to_bytes(_64_bit, big_endian, 2, 3) == data
+
+            # Only the tables added on the first write are reused.
+            del elf.sections[2:]
+
+
+def test_symbol_table_rows():
+    random = Random(0)
+
+    entries = [
+        SymbolTableEntry(
+            name=f"symbol_{random.randrange(100)}".encode(),
+            binding=random.choice(list(STBind)),
+            type_=random.choice(list(STType)),
+            visibility=random.choice(list(STVisibility)),
+            section_index=random.randrange(1 << 16),
+            value=random.randrange(1 << 32),
+            size=random.randrange(1 << 32),
+        )
+        for _ in range(500)
+    ]
+
+    for word_size, word_format in ((4, "I"), (8, "Q")):
+        for endian_format in "<>":
+            with_entries = SymbolTableSection(
+                name=b".symtab",
+                type_=SHType.SHT_SYMTAB,
+                flags=SHFlags.SHF_ALLOC,
+                address=0,
+                link=0,
+                info=0,
+                alignment=1,
+                entry_size=0,
+            )
+            with_entries.entries += entries
+
+            with_rows = SymbolTableSection(
+                name=b".symtab",
+                type_=SHType.SHT_SYMTAB,
+                flags=SHFlags.SHF_ALLOC,
+                address=0,
+                link=0,
+                info=0,
+                alignment=1,
+                entry_size=0,
+            )
+            with_rows.entries += entries[:100]
+            with_rows.rows += [entry.row() for entry in entries[100:]]
+
+            string_table = new_string_table()
+
+            data = with_entries.to_bytes(
+                word_size, word_format, endian_format, string_table
+            )
+
+            entry_size = 8 + (word_size * 2)
+
+            assert len(data) == (len(entries) + 1) * entry_size
+            assert data[:entry_size] == bytes(entry_size)
+            assert data[entry_size:] == b"".join(
+                entry.to_bytes(word_size, word_format, endian_format, string_table)
+                for entry in entries
+            )
+
+            assert (
+                with_rows.to_bytes(word_size, word_format, endian_format, string_table)
+                == data
+            )
+            assert list(with_rows.names()) == [entry.name for entry in entries]
+
+
+def test_elf_write():
+    random = Random(0)
+
+    elf = ELF(undefined_section=True)
+
+    symbol_table = SymbolTableSection(
+        name=b".symtab",
+        type_=SHType.SHT_SYMTAB,
+        flags=SHFlags.SHF_ALLOC,
+        address=0,
+        link=0,
+        info=0,
+        alignment=1,
+        entry_size=0,
+    )
+    symbol_table.rows += [
+        (
+            f"symbol_{index}".encode(),
+            (STBind.STB_LOCAL << 4) | STType.STT_FUNC,
+            STVisibility.STV_DEFAULT,
+            0,
+            random.randrange(1 << 32),
+            0,
+        )
+        for index in range(1000)
+    ]
+
+    elf.sections.append(symbol_table)
+
+    data = elf.to_bytes(True, False)
+
+    default_chunk_size = SymbolTableSection.CHUNK_SIZE
+
+    try:
+        for chunk_size in (1, 7, 1000, 1001):
+            SymbolTableSection.CHUNK_SIZE = chunk_size
+
+            file = BytesIO()
+
+            elf.write(file, True, False, 2, 3)
+
+            assert file.getvalue() == data
+    finally:
+        SymbolTableSection.CHUNK_SIZE = default_chunk_size
+
+    string_table = elf.sections[3]
+
+    assert isinstance(string_table, StringTableSection)
+
+    symbol_table_bytes = symbol_table.to_bytes(8, "Q", "<", string_table)
+
+    assert symbol_table_bytes in data
+    assert len(symbol_table_bytes) == symbol_table.size(8)
+
+
+def test_section_indices_differential():
+    random = Random(0)
+
+    for _ in range(200):
+        sections = []
+        for index in range(random.randint(0, 20)):
+            start = random.randint(0, 200)
+            sections.append(
+                Section(
+                    f"section_{index}".encode(),
+                    start,
+                    start + random.randint(-2, 40),
+                    SectionFlags.R,
+                )
+            )
+
+        sections_by_address = section_indices(sections)
+
+        addresses = sorted(random.randint(-5, 250) for _ in range(60))
+
+        # The first section listed that contains the address.
+        expected = [
+            next(
+                (
+                    index
+                    for index, section in enumerate(sections)
+                    if section.start <= address < section.end
+                ),
+                None,
+            )
+            for address in addresses
+        ]
+
+        assert [sections_by_address.lookup(address) for address in addresses] == (
+            expected
+        )
+        assert sections_by_address.lookup_many(addresses) == expected
@@ -1,4 +1,43 @@
-from sc.idb.btree.python import IndexEntry, IndexPage, LeafEntry, LeafPage
+from io import BufferedReader, BytesIO
+from pathlib import Path
+from random import Random
+from struct import calcsize, pack, pack_into, unpack, unpack_from
+from typing import Any, Optional
+
+import gc
+import os
+import zlib
+
+from sc.idb.btree.python import (
+    Entry,
+    IndexEntry,
+    IndexPage,
+    LeafEntry,
+    LeafPage,
+    Page,
+)
+from sc.idb.extractors import (
+    Extractor,
+    FunctionChunkExtractor,
+    FunctionExtractor,
+    FunctionExtractorChunkHeader,
+    KeyRange,
+    ScanEngine,
+    SegmentExtractor,
+    function_index,
+    iterate_functions,
+    segment_index,
+)
+from sc.idb.idb import CompressionMethod, ID0Mode, IDB, SectionFlags
+from sc.idb.io_ import PositionalFile, ZlibFile
+from sc.idb.net_node import (
+    NetNodeGenerator,
+    decoder,
+    unpack_t,
+    unpack_u,
+    unpack_v,
+)
+from sc.util import IntervalIndex
 
 
 def test_btree_python():
@@ -134,3 +173,1205 @@ def test_btree_python():
     assert test is not None
     assert test.key == b"\x71"
     assert test.value == b"\x71"
+
+
+def test_id0_lazy():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        eager = IDB(file, sections=SectionFlags.ID0)
+
+        assert eager.id0 is not None
+
+        file.seek(0, 0)
+
+        lazy = IDB(
+            file, sections=SectionFlags.ID0, id0_mode=ID0Mode.LAZY, page_cache_size=2
+        )
+
+        assert lazy.id0 is not None
+        assert lazy.id0.page_cache is not None
+
+        key = None
+        count = 0
+        while True:
+            expected = eager.id0.root_page.search(min_=key, min_inclusive=False)
+            actual = lazy.id0.root_page.search(min_=key, min_inclusive=False)
+
+            if expected is None:
+                assert actual is None
+                break
+
+            assert actual is not None
+            assert actual.key == expected.key
+            assert actual.value == expected.value
+
+            key = expected.key
+            count += 1
+
+            assert len(lazy.id0.page_cache.pages) <= 2
+
+        assert count == eager.id0.record_count
+
+
+def test_id0_flat():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        eager = IDB(file, sections=SectionFlags.ID0)
+
+        assert eager.id0 is not None
+
+        file.seek(0, 0)
+
+        flat = IDB(file, sections=SectionFlags.ID0, id0_mode=ID0Mode.FLAT)
+
+        assert flat.id0 is not None
+        assert flat.id0.root_page is None
+
+    expected_entries = [(e.key, bytes(e.value)) for e in eager.id0.iterate()]
+
+    assert [(e.key, e.value) for e in flat.id0.iterate()] == expected_entries
+    assert len(expected_entries) == eager.id0.record_count
+    assert flat.id0.decoded_page_count == eager.id0.decoded_page_count
+
+    random = Random(0)
+    keys = [key for key, _ in expected_entries] + [b"", b"\xff" * 16]
+
+    for _ in range(2000):
+        min_ = random.choice(keys)[: random.randint(0, 16)]
+        max_ = random.choice(keys)[: random.randint(0, 16)]
+        arguments = (
+            random.choice((min_, None)),
+            random.choice((max_, None)),
+            random.choice((True, False)),
+            random.choice((True, False)),
+            random.choice((True, False)),
+        )
+
+        expected = eager.id0.search(*arguments)
+        actual = flat.id0.search(*arguments)
+
+        if expected is None:
+            assert actual is None, arguments
+        else:
+            assert actual is not None, arguments
+            assert (actual.key, actual.value) == (expected.key, expected.value)
+
+
+def linear_search(
+    page: Page,
+    min_: Optional[bytes],
+    max_: Optional[bytes],
+    min_inclusive: bool,
+    max_inclusive: bool,
+    lowest: bool,
+) -> Optional[Entry]:
+    """
+    The original linear scan implementation of Page.search.
+    """
+
+    if (
+        min_ is not None
+        and max_ is not None
+        and (min_ > max_ or (min_ == max_ and not (min_inclusive and max_inclusive)))
+    ):
+        return None
+
+    entry: Optional[Entry] = None
+    if lowest:
+        for entry_ in page.entries:
+            if (
+                min_ is None
+                or (min_inclusive and (entry_.key >= min_))
+                or (not min_inclusive and (entry_.key > min_))
+            ):
+                entry = entry_
+                break
+    else:
+        for entry_ in page.entries[::-1]:
+            if (
+                max_ is None
+                or (max_inclusive and (entry_.key <= max_))
+                or (not max_inclusive and (entry_.key < max_))
+            ):
+                entry = entry_
+                break
+
+    if isinstance(page, IndexPage):
+        child: Page
+        if entry is None:
+            child = (
+                page.entries[-1].after_page if lowest else page.entries[0].before_page
+            )
+        else:
+            assert isinstance(entry, IndexEntry)
+
+            child = entry.before_page if lowest else entry.after_page
+
+        entry = (
+            linear_search(child, min_, max_, min_inclusive, max_inclusive, lowest)
+            or entry
+        )
+
+    if entry is None:
+        return None
+
+    if lowest:
+        if (
+            max_ is None
+            or (max_inclusive and (entry.key <= max_))
+            or (not max_inclusive and (entry.key < max_))
+        ):
+            return entry
+    else:
+        if (
+            min_ is None
+            or (min_inclusive and (entry.key >= min_))
+            or (not min_inclusive and (entry.key > min_))
+        ):
+            return entry
+
+    return None
+
+
+def random_tree(random: Random, keys: list[bytes]) -> Page:
+    if len(keys) <= 4:
+        return LeafPage([LeafEntry(key, key[::-1]) for key in keys])
+
+    separators: list[int] = sorted(
+        random.sample(
+            range(1, len(keys) - 1), random.randint(1, min(3, len(keys) // 3))
+        )
+    )
+
+    pages: list[Page] = []
+    last: int = 0
+    for separator in separators:
+        pages.append(random_tree(random, keys[last:separator]))
+        last = separator + 1
+    pages.append(random_tree(random, keys[last:]))
+
+    return IndexPage(
+        [
+            IndexEntry(keys[separator], keys[separator][::-1], pages[i], pages[i + 1])
+            for i, separator in enumerate(separators)
+        ]
+    )
+
+
+def test_btree_python_search_differential():
+    random = Random(0)
+
+    for _ in range(50):
+        keys = sorted(
+            {
+                random.randbytes(random.randint(1, 3))
+                for _ in range(random.randint(5, 200))
+            }
+        )
+        root = random_tree(random, keys)
+
+        bounds = keys + [random.randbytes(random.randint(1, 3)) for _ in range(20)]
+
+        for _ in range(200):
+            min_ = random.choice(bounds) if random.random() < 0.8 else None
+            max_ = random.choice(bounds) if random.random() < 0.8 else None
+            min_inclusive = random.random() < 0.5
+            max_inclusive = random.random() < 0.5
+            lowest = random.random() < 0.5
+
+            assert root.search(
+                min_, max_, min_inclusive, max_inclusive, lowest
+            ) is linear_search(root, min_, max_, min_inclusive, max_inclusive, lowest)
+
+
+def test_btree_python_iterate():
+    random = Random(1)
+
+    for _ in range(50):
+        keys = sorted(
+            {
+                random.randbytes(random.randint(1, 3))
+                for _ in range(random.randint(5, 200))
+            }
+        )
+        root = random_tree(random, keys)
+
+        assert [entry.key for entry in root.iterate()] == keys
+
+        for _ in range(50):
+            min_ = random.choice(keys + [random.randbytes(random.randint(1, 3))])
+            min_inclusive = random.random() < 0.5
+
+            assert [
+                entry.key for entry in root.iterate(min_, min_inclusive=min_inclusive)
+            ] == [key for key in keys if (key >= min_ if min_inclusive else key > min_)]
+
+        assert [entry.key for entry in root.reverse_iterate()] == keys[::-1]
+
+        for _ in range(50):
+            max_ = random.choice(keys + [random.randbytes(random.randint(1, 3))])
+            max_inclusive = random.random() < 0.5
+
+            assert [
+                entry.key
+                for entry in root.reverse_iterate(max_, max_inclusive=max_inclusive)
+            ] == [
+                key
+                for key in keys[::-1]
+                if (key <= max_ if max_inclusive else key < max_)
+            ]
+
+
+def test_idb_memory_map():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        copied = IDB(file, verify_checksum=True)
+        mapped = IDB(file, verify_checksum=True, memory_map=True)
+
+        assert copied.id0 is not None and mapped.id0 is not None
+
+        expected = [(e.key, e.value) for e in copied.id0.root_page.iterate()]
+        actual = [(e.key, e.value) for e in mapped.id0.root_page.iterate()]
+
+        assert actual == expected
+        assert all(isinstance(value, memoryview) for _, value in actual)
+
+        assert copied.nam is not None and mapped.nam is not None
+        assert mapped.nam.names == copied.nam.names
+
+        del actual
+
+        for id0_mode in ID0Mode:
+            with IDB(file, memory_map=True, id0_mode=id0_mode) as idb:
+                mapping = idb.mapping
+
+                assert mapping is not None and idb.id0 is not None
+
+                idb.id0.search()
+
+            assert mapping.closed
+            assert idb.mapping is None and idb.id0 is None
+
+        # Views held by the failing code do not hide its exception.
+        try:
+            with IDB(file, memory_map=True) as idb:
+                assert idb.id0 is not None
+
+                entries = idb.id0.iterate()
+
+                raise KeyError("Failed.")
+        except KeyError:
+            pass
+        else:
+            assert False, "Exception was not raised."
+
+        del entries
+
+        # Views kept beyond the IDB keep the mapping open.
+        idb = IDB(file, memory_map=True)
+
+        assert idb.id0 is not None
+
+        value = next(idb.id0.iterate()).value
+
+        try:
+            idb.close()
+        except BufferError:
+            pass
+        else:
+            assert False, "Mapping was closed with views of it still held."
+
+
+def rewrite_idb(data: bytes, compress: bool = True, id0_suffix: bytes = b"") -> bytes:
+    """
+    Rewrites an IDB with every section zlib compressed and/or data appended to ID0.
+    """
+
+    header = list(unpack_from("<4s2xQQ4xIHQQQIIIIIQI", data))
+    offset_indices = (1, 2, 5, 6, 7, 13)
+    checksum_indices = (8, 9, 10, 11, 12, 14)
+
+    result = bytearray(data[: min(header[i] for i in offset_indices if header[i] != 0)])
+
+    for offset_index, checksum_index in zip(offset_indices, checksum_indices):
+        offset = header[offset_index]
+
+        if offset == 0:
+            continue
+
+        compression_method, length = unpack_from("<BQ", data, offset)
+
+        assert compression_method == 0
+
+        section = data[offset + 9 : offset + 9 + length]
+
+        if offset_index == 1:
+            section += id0_suffix
+
+        if compress:
+            section = zlib.compress(section)
+
+        header[offset_index] = len(result)
+        header[checksum_index] = zlib.crc32(section)
+
+        result += pack("<BQ", 2 if compress else 0, len(section)) + section
+
+    pack_into("<4s2xQQ4xIHQQQIIIIIQI", result, 0, *header)
+
+    return bytes(result)
+
+
+def test_idb_compressed():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        uncompressed = IDB(file)
+        compressed = IDB(BytesIO(rewrite_idb(path.read_bytes())), verify_checksum=True)
+
+    assert compressed.id0 is not None and uncompressed.id0 is not None
+    assert compressed.id0.header.compression_method == CompressionMethod.ZLIB
+
+    assert [(e.key, e.value) for e in compressed.id0.root_page.iterate()] == [
+        (e.key, e.value) for e in uncompressed.id0.root_page.iterate()
+    ]
+
+    assert compressed.id1 is not None and uncompressed.id1 is not None
+    assert [(s.start, s.end, s.data) for s in compressed.id1.segments] == [
+        (s.start, s.end, s.data) for s in uncompressed.id1.segments
+    ]
+
+    assert compressed.nam is not None and uncompressed.nam is not None
+    assert compressed.nam.names == uncompressed.nam.names
+
+    assert compressed.til is not None and uncompressed.til is not None
+    assert compressed.til.title == uncompressed.til.title
+
+
+def test_zlib_file():
+    data = bytes(range(256)) * 1000
+    compressed = zlib.compress(data)
+
+    file = ZlibFile(BytesIO(compressed), len(compressed))
+    file.CHUNK_SIZE = 100
+
+    assert file.read(10) == data[:10]
+    assert file.seek(1000, 1) == 1010
+    assert file.read(5000) == data[1010:6010]
+    assert file.read() == data[6010:]
+    assert file.read(1) == b""
+
+    # Highly compressible data still comes out a chunk at a time.
+    data = bytes(1000000)
+    compressed = zlib.compress(data)
+
+    file = ZlibFile(BytesIO(compressed), len(compressed))
+    file.CHUNK_SIZE = 100
+
+    length = 0
+    while file.fill():
+        assert 0 < len(file.output) <= 100
+        length += len(file.output)
+
+    assert length == len(data)
+
+
+class CountingFile(BytesIO):
+    read_count: int = 0
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        data = super().read(size)
+        self.read_count += len(data)
+        return data
+
+
+def test_idb_checksum():
+    data = (Path(__file__).parent / "assets" / "test.i64").read_bytes()
+
+    for data in (data, rewrite_idb(data)):
+        file = CountingFile(data)
+
+        IDB(file, verify_checksum=True)
+
+        # Every byte is read at most once, including the checksummed ones.
+        assert file.read_count <= len(data)
+
+        header = list(unpack_from("<4s2xQQ4xIHQQQIIIIIQI", data))
+        header[10] ^= 1  # NAM checksum.
+        corrupted = bytearray(data)
+        pack_into("<4s2xQQ4xIHQQQIIIIIQI", corrupted, 0, *header)
+
+        IDB(BytesIO(corrupted))
+
+        try:
+            IDB(BytesIO(corrupted), verify_checksum=True)
+        except AssertionError:
+            pass
+        else:
+            assert False, "Corrupted checksum was not detected."
+
+
+def test_idb_threads():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    def summary(idb: IDB) -> tuple:
+        assert idb.id0 is not None and idb.id1 is not None and idb.nam is not None
+        assert idb.til is not None
+
+        return (
+            [(e.key, bytes(e.value)) for e in idb.id0.iterate()],
+            [(s.start, s.end, bytes(s.data)) for s in idb.id1.segments],
+            idb.nam.names,
+            idb.til.title,
+        )
+
+    with path.open("rb") as file:
+        expected = summary(IDB(file))
+
+        file.seek(0, 0)
+        assert summary(IDB(file, verify_checksum=True, threads=4)) == expected
+
+        file.seek(0, 0)
+        assert summary(IDB(file, memory_map=True, threads=4)) == expected
+
+    # Named by its descriptor.
+    with os.fdopen(os.open(path, os.O_RDONLY), "rb") as file:
+        assert summary(IDB(file, threads=4)) == expected
+
+    # Without a descriptor, decoded on one thread.
+    with BufferedReader(BytesIO(path.read_bytes())) as buffered_file:
+        assert summary(IDB(buffered_file, threads=4)) == expected
+
+    # Loaded after the caller has dropped the file, which the sections keep open.
+    idb = IDB(path.open("rb"), threads=4, defer=True)
+    gc.collect()
+
+    assert summary(idb) == expected
+
+    assert idb.id0 is not None and isinstance(idb.id0.body_file, PositionalFile)
+    idb.id0.body_file.file.close()
+
+    compressed = BytesIO(rewrite_idb(path.read_bytes()))
+
+    assert summary(IDB(compressed, verify_checksum=True, threads=4)) == expected
+
+
+def test_idb_defer():
+    data = (Path(__file__).parent / "assets" / "test.i64").read_bytes()
+
+    for data in (data, rewrite_idb(data)):
+        expected = IDB(BytesIO(data))
+        deferred = IDB(BytesIO(data), verify_checksum=True, defer=True)
+
+        sections = (
+            deferred.id0,
+            deferred.id1,
+            deferred.nam,
+            deferred.til,
+            deferred.id2,
+        )
+
+        assert all(section is not None and not section.loaded for section in sections)
+
+        assert deferred.id0 is not None and expected.id0 is not None
+        assert deferred.id0.word_size == expected.id0.word_size
+        assert not deferred.id0.loaded
+
+        assert deferred.nam is not None and expected.nam is not None
+        assert deferred.nam.names == expected.nam.names
+        assert deferred.nam.loaded
+
+        assert [(e.key, e.value) for e in deferred.id0.root_page.iterate()] == [
+            (e.key, e.value) for e in expected.id0.root_page.iterate()
+        ]
+
+        assert deferred.id1 is not None and not deferred.id1.loaded
+
+        # Only the attributes of the body load it.
+        try:
+            getattr(deferred.id1, "segmnets")
+        except AttributeError:
+            pass
+        else:
+            assert False, "Unknown attribute was found."
+
+        assert not deferred.id1.loaded
+        assert hasattr(deferred.id1, "segments") and deferred.id1.loaded
+
+        header = list(unpack_from("<4s2xQQ4xIHQQQIIIIIQI", data))
+        header[10] ^= 1  # NAM checksum.
+        corrupted = bytearray(data)
+        pack_into("<4s2xQQ4xIHQQQIIIIIQI", corrupted, 0, *header)
+
+        deferred = IDB(BytesIO(corrupted), verify_checksum=True, defer=True)
+
+        assert deferred.nam is not None
+
+        # Nothing is kept from a failed load, so every access fails the same way.
+        for _ in range(2):
+            try:
+                deferred.nam.names
+            except AssertionError:
+                pass
+            else:
+                assert False, "Corrupted checksum was not detected."
+
+            assert not deferred.nam.loaded
+            assert "names" not in vars(deferred.nam)
+
+
+def test_id0_skips_unreachable_pages():
+    data = (Path(__file__).parent / "assets" / "test.i64").read_bytes()
+
+    expected = IDB(BytesIO(data))
+
+    assert expected.id0 is not None
+    assert expected.id0.decoded_page_count == expected.id0.page_count
+    assert expected.id0.skipped_page_count is not None
+
+    # Garbage that can not be decoded, appended as free pages.
+    garbage = b"\xff" * (expected.id0.page_size * 3)
+
+    for compress in (False, True):
+        for verify_checksum in (False, True):
+            idb = IDB(
+                BytesIO(rewrite_idb(data, compress=compress, id0_suffix=garbage)),
+                verify_checksum=verify_checksum,
+            )
+
+            assert idb.id0 is not None
+            assert idb.id0.decoded_page_count == expected.id0.decoded_page_count
+            assert idb.id0.skipped_page_count == expected.id0.skipped_page_count + 3
+            assert [(e.key, e.value) for e in idb.id0.root_page.iterate()] == [
+                (e.key, e.value) for e in expected.id0.root_page.iterate()
+            ]
+
+
+def test_net_node_names():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    for id0_mode in ID0Mode:
+        with path.open("rb") as file:
+            idb = IDB(
+                file, sections=SectionFlags.ID0 | SectionFlags.NAM, id0_mode=id0_mode
+            )
+
+            assert idb.id0 is not None
+            assert idb.nam is not None
+
+            net_node_generator = NetNodeGenerator(idb.id0)
+
+            # Include nodes without names, and ones below and above every named node.
+            node_ids = [*idb.nam.names, 0, 1, idb.nam.names[0] + 1, (1 << 64) - 1]
+
+            expected = {}
+            for node_id in node_ids:
+                try:
+                    expected[node_id] = net_node_generator.net_node(node_id).name()
+                except KeyError:
+                    pass
+
+            assert len(expected) == len(set(idb.nam.names))
+            assert net_node_generator.names(node_ids) == expected
+            assert net_node_generator.names([]) == {}
+
+            # Every node, so that names are found by walking rather than searching.
+            node_ids = [
+                unpack_from(f">{idb.id0.word_format}", entry.key, 1)[0]
+                for entry in idb.id0.iterate()
+                if entry.key.startswith(b".") and len(entry.key) > idb.id0.word_size + 1
+            ]
+
+            expected = {}
+            for node_id in node_ids:
+                try:
+                    expected[node_id] = net_node_generator.net_node(node_id).name()
+                except KeyError:
+                    pass
+
+            assert net_node_generator.names(node_ids) == expected
+
+
+def reference_unpack(format_: str, data: bytes, word_size: int) -> tuple[Any, ...]:
+    """
+    The original interpreted implementation of NetNode.unpack (with return_offset).
+    """
+
+    repeat_count: int = 0
+    offset: int = 0
+    results: list[Any] = []
+
+    size: int
+    index: int
+    value: str
+    for index, value in enumerate(format_):
+        if index == 0 and value in "<>":
+            continue
+
+        if value in "0123456789":
+            repeat_count *= 10
+            repeat_count += int(value)
+
+            continue
+
+        if repeat_count == 0:
+            repeat_count = 1
+
+        if value in "xcbB?hHiIlLqQnNefdspP":
+            size = calcsize(f"{repeat_count}{value}")
+
+            results += unpack(f">{repeat_count}{value}", data[offset : offset + size])
+
+            offset += size
+        elif value in "TUVWtuvw":
+            result: int
+            for _ in range(repeat_count):
+                if value.upper() == "T":
+                    result, size = unpack_t(data, offset)
+                    result = int.from_bytes(
+                        result.to_bytes(2, "big", signed=False),
+                        "big",
+                        signed=value.islower(),
+                    )
+                elif value.upper() == "U" or (value.upper() == "W" and word_size == 4):
+                    result, size = unpack_u(data, offset)
+                    result = int.from_bytes(
+                        result.to_bytes(4, "big", signed=False),
+                        "big",
+                        signed=value.islower(),
+                    )
+                elif value.upper() == "V" or (value.upper() == "W" and word_size == 8):
+                    result, size = unpack_v(data, offset)
+                    result = int.from_bytes(
+                        result.to_bytes(8, "big", signed=False),
+                        "big",
+                        signed=value.islower(),
+                    )
+                else:
+                    assert False, "UNEXPECTED"
+
+                results.append(result)
+                offset += size
+        else:
+            raise ValueError(
+                f"""Invalid character "{value}" at index {index} in format."""
+            )
+
+        repeat_count = 0
+
+    results.append(offset)
+
+    return tuple(results)
+
+
+def test_net_node_unpack_differential():
+    random = Random(0)
+
+    specifiers = "TUVWtuvwxcbB?hHiIqQsefdlnP!"
+
+    for _ in range(5000):
+        format_ = random.choice(("", "", "<", ">")) + "".join(
+            random.choice(("", "", str(random.randint(0, 3))))
+            + random.choice(specifiers)
+            for _ in range(random.randint(0, 6))
+        )
+        # Prefixes that select every length of the variable sized encodings.
+        data = bytes(
+            (
+                random.choice((0x00, 0x7F, 0x80, 0xBF, 0xC0, 0xDF, 0xE0, 0xFF))
+                if random.random() < 0.5
+                else random.randrange(256)
+            )
+            for _ in range(random.randint(0, 64))
+        )
+
+        for word_size in (4, 8):
+            expected: Any
+            try:
+                expected = repr(reference_unpack(format_, data, word_size))
+            except Exception as exception:
+                expected = type(exception)
+
+            actual: Any
+            try:
+                results, offset = decoder(format_, word_size).decode(data)
+
+                actual = repr(tuple(results + [offset]))
+            except Exception as exception:
+                actual = type(exception)
+
+            assert actual == expected, (format_, data, word_size)
+
+
+def test_net_node_generator_cache():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        idb = IDB(file, sections=SectionFlags.ID0)
+
+    assert idb.id0 is not None
+
+    net_node_generator = NetNodeGenerator(idb.id0, cache_size=4)
+
+    funcs = net_node_generator.net_node(b"$ funcs")
+
+    assert net_node_generator.net_node(b"$ funcs") is funcs
+    assert net_node_generator.net_node(funcs.node_id) is funcs
+
+    for node_id in range(8):
+        net_node_generator.net_node(node_id)
+
+    assert len(net_node_generator.net_nodes) == 4
+    assert net_node_generator.net_node(b"$ funcs") is not funcs
+    assert net_node_generator.net_node(b"$ funcs").node_id == funcs.node_id
+
+    for index in (None, 0, 1, 0x7FFFFFFFFFFFFFFF, -1, -0x8000000000000000):
+        key = funcs.make_key(b"S", index=index)
+
+        assert key[:10] == pack(">cQ", b".", funcs.node_id) + b"S"
+        assert funcs.break_key(key, signed=index is not None and index < 0) == (
+            b"S",
+            index,
+        )
+
+
+def test_id0_scan():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    for id0_mode in ID0Mode:
+        with path.open("rb") as file:
+            idb = IDB(file, sections=SectionFlags.ID0, id0_mode=id0_mode)
+
+            assert idb.id0 is not None
+
+            keys = [entry.key for entry in idb.id0.iterate()]
+
+            random = Random(0)
+            bounds = keys + [b"", b"\xff" * 16, b".\xff", b"N\xff\xff"]
+
+            for _ in range(300):
+                start = random.choice((random.choice(bounds), None))
+                stop = random.choice((random.choice(bounds), None))
+                prefix = random.choice(
+                    (random.choice(bounds)[: random.randint(0, 10)], None)
+                )
+                reverse = random.random() < 0.5
+
+                expected = [
+                    key
+                    for key in keys
+                    if (start is None or key >= start)
+                    and (stop is None or key < stop)
+                    and (prefix is None or key.startswith(prefix))
+                ]
+
+                if reverse:
+                    expected.reverse()
+
+                assert [
+                    entry.key for entry in idb.id0.scan(start, stop, prefix, reverse)
+                ] == expected, (start, stop, prefix, reverse)
+
+
+def test_net_node_items():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        idb = IDB(file, sections=SectionFlags.ID0)
+
+    assert idb.id0 is not None
+
+    net_node_generator = NetNodeGenerator(idb.id0)
+
+    for name in (b"$ funcs", b"$ segs", b"Root Node"):
+        net_node = net_node_generator.net_node(name)
+
+        items = list(net_node.items())
+
+        assert len(items) > 0
+        assert [tag for tag, _, _ in items] == sorted(tag for tag, _, _ in items)
+
+        tag: bytes
+        for tag in {tag for tag, _, _ in items}:
+            assert [
+                (net_node.key_index(entry.key), bytes(entry.value))
+                for entry in net_node.entries(tag)
+            ] == [
+                (index, bytes(value))
+                for item_tag, index, value in items
+                if item_tag == tag and isinstance(index, int)
+            ]
+
+        for tag, index, _ in net_node.items(signed=True):
+            if isinstance(index, int):
+                assert net_node.break_key(
+                    net_node.make_key(tag, index), signed=True
+                ) == (tag, index)
+
+
+def test_net_node_blob():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        idb = IDB(file, sections=SectionFlags.ID0)
+
+    assert idb.id0 is not None
+
+    net_node_generator = NetNodeGenerator(idb.id0)
+
+    segment_strings = net_node_generator.net_node(b"$ segstrings")
+
+    assert bytes(segment_strings.blob(b"S")) == bytes(
+        segment_strings.entry(b"S", 0).value
+    )
+
+    try:
+        segment_strings.blob(b"S", 1)
+    except KeyError:
+        pass
+    else:
+        assert False, "Missing blob was not detected."
+
+    tested = 0
+
+    for node_id in {entry.key[1:9] for entry in idb.id0.scan(prefix=b".\xff")}:
+        net_node = net_node_generator.net_node(int.from_bytes(node_id, "big"))
+
+        values: dict[tuple[bytes, int], bytes] = {
+            (tag, index): bytes(value)
+            for tag, index, value in net_node.items()
+            if isinstance(index, int)
+        }
+
+        tag: bytes
+        index: int
+        for tag, index in values:
+            expected = b""
+            next_index = index
+            while (tag, next_index) in values:
+                expected += values[(tag, next_index)]
+                next_index += 1
+
+            tested += next_index - index > 1
+
+            assert bytes(net_node.blob(tag, index)) == expected
+
+    assert tested > 0
+
+
+class RangeRecorder(Extractor):
+    """
+    Records the keys it is fed from a set of ranges.
+    """
+
+    key_ranges: list[KeyRange]
+    keys: list[bytes]
+    finished: bool
+
+    def __init__(
+        self,
+        net_node_generator: NetNodeGenerator,
+        key_ranges: list[KeyRange],
+        engine: Optional[ScanEngine] = None,
+    ) -> None:
+        self.key_ranges = key_ranges
+        self.keys = []
+        self.finished = False
+
+        super().__init__(net_node_generator, engine=engine)
+
+    def ranges(self) -> list[KeyRange]:
+        return self.key_ranges
+
+    def feed(self, entry: Entry) -> None:
+        assert not self.finished
+
+        self.keys.append(bytes(entry.key))
+
+    def finish(self) -> None:
+        self.finished = True
+
+
+def test_scan_engine():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        idb = IDB(file, sections=SectionFlags.ID0)
+
+    assert idb.id0 is not None
+
+    net_node_generator = NetNodeGenerator(idb.id0)
+
+    keys = [bytes(entry.key) for entry in idb.id0.iterate()]
+
+    random = Random(0)
+
+    for _ in range(20):
+        engine = ScanEngine(net_node_generator)
+
+        recorders = []
+        for _ in range(random.randint(1, 4)):
+            key_ranges: list[KeyRange] = []
+            for _ in range(random.randint(0, 3)):
+                start, stop = sorted(random.sample(keys, 2))
+                key_ranges.append((start, random.choice((stop, None))))
+
+                if random.random() < 0.5:  # Overlapping a range of its own.
+                    start, stop = sorted(random.sample(keys, 2))
+                    key_ranges.append((start, random.choice((stop, None))))
+
+            recorders.append(RangeRecorder(net_node_generator, key_ranges, engine))
+
+        engine.run()
+
+        for recorder in recorders:
+            assert recorder.finished
+            # Each entry once, in key order.
+            assert recorder.keys == [
+                key
+                for key in keys
+                if any(
+                    start <= key and (stop is None or key < stop)
+                    for start, stop in recorder.key_ranges
+                )
+            ]
+
+    # Ranges of one extractor that overlap, touch and contain each other.
+    key_ranges = [
+        (keys[10], keys[20]),
+        (keys[15], keys[25]),
+        (keys[25], keys[30]),
+        (keys[12], keys[14]),
+    ]
+    recorder = RangeRecorder(net_node_generator, key_ranges)
+
+    assert recorder.keys == keys[10:30]
+
+    engine = ScanEngine(net_node_generator)
+
+    segment_extractor = SegmentExtractor(net_node_generator, engine=engine)
+    function_extractor = FunctionExtractor(net_node_generator, engine=engine)
+
+    assert segment_extractor.segments == []
+    assert function_extractor.functions == []
+
+    engine.run()
+
+    assert [
+        (segment.start, segment.end, segment.name, segment.class_)
+        for segment in segment_extractor.segments
+    ] == [
+        (segment.start, segment.end, segment.name, segment.class_)
+        for segment in SegmentExtractor(net_node_generator).segments
+    ]
+    assert len(segment_extractor.segments) > 0
+
+    assert [
+        (function.head_header.start, function.name)
+        for function in function_extractor.functions
+    ] == [
+        (function.head_header.start, function.name)
+        for function in FunctionExtractor(net_node_generator).functions
+    ]
+    assert len(function_extractor.functions) > 0
+
+
+def test_iterate_functions():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        idb = IDB(file, sections=SectionFlags.ID0)
+
+    assert idb.id0 is not None
+
+    net_node_generator = NetNodeGenerator(idb.id0)
+
+    expected = sorted(
+        (
+            function.head_header.start,
+            function.name,
+            sorted(header.start for header in function.tail_headers),
+        )
+        for function in FunctionExtractor(net_node_generator).functions
+    )
+
+    assert any(tail_starts for _, _, tail_starts in expected)
+
+    for name_batch_size in (1, 3, 1024):
+        assert [
+            (
+                function.head_header.start,
+                function.name,
+                sorted(header.start for header in function.tail_headers),
+            )
+            for function in iterate_functions(
+                net_node_generator, name_batch_size=name_batch_size
+            )
+        ] == expected
+
+    # Chunks collected in a shared sweep, which streaming leaves as they were.
+    engine = ScanEngine(net_node_generator)
+    segment_extractor = SegmentExtractor(net_node_generator, engine=engine)
+    function_chunk_extractor = FunctionChunkExtractor(net_node_generator, engine=engine)
+    engine.run()
+
+    assert len(segment_extractor.segments) > 0
+
+    for _ in range(2):
+        assert [
+            (
+                function.head_header.start,
+                function.name,
+                sorted(header.start for header in function.tail_headers),
+            )
+            for function in iterate_functions(
+                net_node_generator, chunk_extractor=function_chunk_extractor
+            )
+        ] == expected
+
+    # A tail without its head is caught before any function is streamed.
+    function_chunk_extractor = FunctionChunkExtractor(
+        net_node_generator, engine=ScanEngine(net_node_generator)
+    )
+    start, stop = function_chunk_extractor.ranges()[0]
+
+    for entry in idb.id0.scan(start=start, stop=stop):
+        chunk_header = FunctionExtractorChunkHeader(
+            entry, function_chunk_extractor.function_header_net_node
+        )
+
+        if chunk_header.flags & FunctionExtractorChunkHeader.TAIL:
+            function_chunk_extractor.feed(entry)
+
+    try:
+        function_chunk_extractor.finish()
+    except AssertionError:
+        pass
+    else:
+        assert False, "Tail without a head was not detected."
+
+
+def test_interval_index_differential():
+    random = Random(0)
+
+    for _ in range(200):
+        intervals = []
+        for value in range(random.randint(0, 20)):
+            start = random.randint(0, 200)
+            intervals.append((start, start + random.randint(0, 30), value))
+
+        if random.random() < 0.5:  # Mostly without overlaps, as segments are.
+            intervals.sort()
+            intervals = [
+                interval
+                for index, interval in enumerate(intervals)
+                if all(interval[0] >= other[1] for other in intervals[:index])
+            ]
+
+        index = IntervalIndex(intervals)
+
+        def expected(address: int) -> Optional[int]:
+            # The containing interval that starts last, or was added last on a tie.
+            containing = sorted(
+                (interval for interval in intervals if interval[0] <= address),
+                key=lambda interval: interval[0],
+            )
+            containing = [interval for interval in containing if address < interval[1]]
+
+            return containing[-1][2] if len(containing) > 0 else None
+
+        addresses = sorted(random.randint(-5, 240) for _ in range(50))
+
+        assert [index.lookup(address) for address in addresses] == [
+            expected(address) for address in addresses
+        ]
+        assert index.lookup_many(addresses) == [
+            expected(address) for address in addresses
+        ]
+
+
+def test_interval_index_covering():
+    count = 5000
+
+    # One interval covering thousands of others, with gaps between them.
+    index = IntervalIndex(
+        [(0, count * 10, -1)]
+        + [(value * 10 + 2, value * 10 + 5, value) for value in range(count)]
+    )
+
+    addresses = [value * 10 + offset for value in range(count) for offset in (3, 7)]
+    expected = [result for value in range(count) for result in (value, -1)]
+
+    assert [index.lookup(address) for address in addresses] == expected
+    assert index.lookup_many(addresses) == expected
+    assert index.lookup(count * 10) is None
+
+
+def test_segment_and_function_index():
+    path = Path(__file__).parent / "assets" / "test.i64"
+
+    with path.open("rb") as file:
+        idb = IDB(file, sections=SectionFlags.ID0)
+
+    assert idb.id0 is not None
+
+    net_node_generator = NetNodeGenerator(idb.id0)
+
+    segments = SegmentExtractor(net_node_generator).segments
+    functions = list(iterate_functions(net_node_generator))
+
+    segments_by_address = segment_index(segments)
+    functions_by_address = function_index(functions)
+
+    addresses = sorted(
+        {
+            address
+            for segment in segments
+            for address in (segment.start - 1, segment.start, segment.end - 1)
+        }
+        | {
+            address
+            for function in functions
+            for header in [function.head_header] + function.tail_headers
+            for address in (header.start - 1, header.start, header.end - 1, header.end)
+        }
+    )
+
+    expected_segments = [
+        next(
+            (segment for segment in segments if segment.start <= address < segment.end),
+            None,
+        )
+        for address in addresses
+    ]
+    expected_functions = [
+        next(
+            (
+                function
+                for function in functions
+                for header in [function.head_header] + function.tail_headers
+                if header.start <= address < header.end
+            ),
+            None,
+        )
+        for address in addresses
+    ]
+
+    assert [segments_by_address.lookup(address) for address in addresses] == (
+        expected_segments
+    )
+    assert segments_by_address.lookup_many(addresses) == expected_segments
+
+    assert [functions_by_address.lookup(address) for address in addresses] == (
+        expected_functions
+    )
+    assert functions_by_address.lookup_many(addresses) == expected_functions
+
+    # The tail chunk resolves to its parent function.
+    assert any(
+        functions_by_address.lookup(header.start) is function
+        for function in functions
+        for header in function.tail_headers
+    )
@@ -1,4 +1,6 @@
-from typing import Any
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Generic, Iterable, Optional, TypeVar
 
 
 def fnn(*args: Any) -> Any:
@@ -11,3 +13,157 @@ def fnn(*args: Any) -> Any:
             return arg
 
     return None
+
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A mapping that holds at most maximum_size items.
+    The least recently used item is evicted first.
+    """
+
+    maximum_size: int
+    items: "OrderedDict[K, V]"
+
+    def __init__(self, maximum_size: int) -> None:
+        assert maximum_size > 0, "Cache size must be positive."
+
+        self.maximum_size = maximum_size
+        self.items = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.items
+
+    def get(self, key: K) -> Optional[V]:
+        value: Optional[V] = self.items.get(key)
+
+        if value is not None:
+            self.items.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self.items[key] = value
+        self.items.move_to_end(key)
+
+        if len(self.items) > self.maximum_size:
+            self.items.popitem(last=False)
+
+
+class IntervalIndex(Generic[V]):
+    """
+    Half-open intervals sorted by start, for finding the one that contains an address
+    in O(log n). Where intervals overlap, the containing one that starts last is found
+    by descending a tree of the highest ends, however many intervals one covers.
+    """
+
+    starts: list[int]
+    ends: list[int]
+    maximum_ends: list[int]  # The highest end of the interval and those before it.
+    values: list[V]
+    size: int  # The number of leaves of the tree, a power of two.
+    tree: list[int]  # The highest end under each node, with the leaves from size.
+
+    def __init__(self, intervals: Iterable[tuple[int, int, V]]) -> None:
+        self.starts = []
+        self.ends = []
+        self.maximum_ends = []
+        self.values = []
+
+        start: int
+        end: int
+        value: V
+        for start, end, value in sorted(intervals, key=lambda interval: interval[0]):
+            self.starts.append(start)
+            self.ends.append(end)
+            self.maximum_ends.append(
+                end if len(self.maximum_ends) == 0 else max(end, self.maximum_ends[-1])
+            )
+            self.values.append(value)
+
+        self.size = 1
+        while self.size < len(self.ends):
+            self.size *= 2
+
+        # Padding leaves are never searched, so their value does not matter.
+        self.tree = [0] * self.size + self.ends + [0] * (self.size - len(self.ends))
+
+        node: int
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[node * 2], self.tree[node * 2 + 1])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def containing(self, address: int, index: int) -> Optional[V]:
+        """
+        Finds the value containing the address, from the last interval at or before the
+        index.
+        """
+
+        if index < 0 or self.maximum_ends[index] <= address:
+            return None
+
+        if self.ends[index] > address:  # Without overlaps, always the case.
+            return self.values[index]
+
+        # The nodes covering the intervals up to the index, from right to left.
+        right_nodes: list[int] = []
+        left_nodes: list[int] = []
+        low: int = self.size
+        high: int = self.size + index + 1
+        while low < high:
+            if low & 1:
+                left_nodes.append(low)
+                low += 1
+
+            if high & 1:
+                high -= 1
+                right_nodes.append(high)
+
+            low //= 2
+            high //= 2
+
+        node: int
+        for node in right_nodes + left_nodes[::-1]:
+            if self.tree[node] > address:
+                # Descend to the last interval under the node that ends after it.
+                while node < self.size:
+                    node *= 2
+
+                    if self.tree[node + 1] > address:
+                        node += 1
+
+                return self.values[node - self.size]
+
+        assert False, "UNEXPECTED"
+
+    def lookup(self, address: int) -> Optional[V]:
+        return self.containing(address, bisect_right(self.starts, address) - 1)
+
+    def lookup_many(self, addresses: Iterable[int]) -> list[Optional[V]]:
+        """
+        Looks up sorted addresses in a single merge pass over the intervals.
+        """
+
+        results: list[Optional[V]] = []
+        index: int = -1
+        previous: Optional[int] = None
+
+        address: int
+        for address in addresses:
+            assert previous is None or previous <= address, "Addresses are not sorted."
+
+            while index + 1 < len(self.starts) and self.starts[index + 1] <= address:
+                index += 1
+
+            results.append(self.containing(address, index))
+            previous = address
+
+        return results
@@ -0,0 +1,486 @@
+from io import BytesIO
+from pathlib import Path
+from random import Random
+from struct import pack, pack_into, unpack_from
+from sys import argv, path
+from tempfile import TemporaryDirectory
+from timeit import repeat
+from tracemalloc import get_traced_memory, start, stop
+from typing import Callable
+
+import zlib
+
+BASE_DIRECTORY = Path(__file__).parent.parent
+
+path.insert(0, str(BASE_DIRECTORY))
+
+from sc.elf import section_indices
+from sc.elf.constants import SHFlags, SHType, STBind, STType, STVisibility
+from sc.elf.elf import StringTableSection, SymbolTableEntry, SymbolTableSection
+from sc.idb.btree.idb import Page as IDBPage
+from sc.idb.idb import ID0Mode, IDB, SectionFlags
+from sc.idb.net_node import NetNode, NetNodeGenerator
+from sc.structures import Section, SectionFlags as BundleSectionFlags
+
+TEST_IDB = BASE_DIRECTORY / "sc" / "tests" / "assets" / "test.i64"
+
+HEADER_FORMAT = "<4s2xQQ4xIHQQQIIIIIQI"
+OFFSET_INDICES = (1, 2, 5, 6, 7, 13)
+CHECKSUM_INDICES = (8, 9, 10, 11, 12, 14)
+NIBBLES = bytes(i & 0x0F for i in range(256))
+
+
+def rewrite_idb(data: bytes, padding: int = 0, compress: bool = False) -> bytes:
+    """
+    Rewrites an IDB with padding appended to every section and optionally compressed.
+    The parsers ignore trailing section data, but still decompress and checksum it.
+    """
+
+    random = Random(0)
+    header = list(unpack_from(HEADER_FORMAT, data))
+
+    result = bytearray(data[: min(header[i] for i in OFFSET_INDICES if header[i] != 0)])
+
+    for offset_index, checksum_index in zip(OFFSET_INDICES, CHECKSUM_INDICES):
+        offset = header[offset_index]
+
+        if offset == 0:
+            continue
+
+        _, length = unpack_from("<BQ", data, offset)
+
+        section = data[offset + 9 : offset + 9 + length]
+
+        if offset_index == 1:
+            # ID0 pages are parsed, and zeroed pages are empty leaves.
+            section += bytes(padding)
+        else:
+            # Compressible but not trivially so.
+            section += random.randbytes(padding).translate(NIBBLES)
+
+        if compress:
+            section = zlib.compress(section)
+
+        header[offset_index] = len(result)
+        header[checksum_index] = zlib.crc32(section)
+
+        result += pack("<BQ", 2 if compress else 0, len(section)) + section
+
+    pack_into(HEADER_FORMAT, result, 0, *header)
+
+    return bytes(result)
+
+
+def report(name: str, function: Callable[[], object], number: int) -> float:
+    best: float = min(repeat(function, number=number, repeat=5)) / number
+
+    print(f"{name}: {best * 1000:.3f} ms")
+
+    return best
+
+
+def benchmark_sections() -> None:
+    """
+    Times loading every section of test.i64 and of a large compressed synthetic IDB,
+    with one thread and with six, from a file and from a memory map.
+    """
+
+    with TemporaryDirectory() as directory:
+        files: list[tuple[str, Path, int]] = [("test.i64", TEST_IDB, 50)]
+
+        large: Path = Path(directory) / "large.i64"
+        large.write_bytes(
+            rewrite_idb(TEST_IDB.read_bytes(), padding=1 << 24, compress=True)
+        )
+        files.append(("large synthetic (compressed)", large, 1))
+
+        name: str
+        file_path: Path
+        number: int
+        for name, file_path, number in files:
+            for memory_map in (False, True):
+
+                def load(threads: int) -> None:
+                    with file_path.open("rb") as file:
+                        IDB(
+                            file,
+                            verify_checksum=True,
+                            memory_map=memory_map,
+                            threads=threads,
+                        )
+
+                label: str = f"{name}, memory_map={memory_map}"
+                sequential = report(f"{label}, 1 thread", lambda: load(1), number)
+                threaded = report(f"{label}, 6 threads", lambda: load(6), number)
+
+                print(f"{label}: {sequential / threaded:.2f}x")
+
+
+def id0_pages(data: bytes) -> list[bytes]:
+    """
+    Splits the (uncompressed) ID0 section of an IDB into raw pages.
+    """
+
+    id0_offset: int = unpack_from(HEADER_FORMAT, data)[1]
+    compression_method, length = unpack_from("<BQ", data, id0_offset)
+
+    assert compression_method == 0, "ID0 must be uncompressed."
+
+    section: bytes = data[id0_offset + 9 : id0_offset + 9 + length]
+    (page_size,) = unpack_from("<H", section, 4)
+
+    return [
+        section[offset : offset + page_size]
+        for offset in range(page_size, len(section) - page_size + 1, page_size)
+    ]
+
+
+def benchmark_pages() -> None:
+    """
+    Times decoding every raw ID0 page of test.i64 into keys and values, in pages per
+    second.
+    """
+
+    pages: list[bytes] = id0_pages(TEST_IDB.read_bytes())
+
+    def decode() -> None:
+        for page in pages:
+            IDBPage(page)
+
+    best: float = report(f"decode {len(pages)} pages", decode, 200)
+
+    print(f"{len(pages) / best:,.0f} pages/s")
+
+
+def benchmark_index() -> None:
+    """
+    Measures the memory an EAGER and a FLAT ID0 of test.i64 take, and the time to
+    search for each of its keys.
+    """
+
+    keys: list[bytes] = []
+
+    mode: ID0Mode
+    for mode in (ID0Mode.EAGER, ID0Mode.FLAT):
+        start()
+
+        with TEST_IDB.open("rb") as file:
+            idb: IDB = IDB(file, sections=SectionFlags.ID0, id0_mode=mode)
+
+        memory: int = get_traced_memory()[0]
+
+        stop()
+
+        assert idb.id0 is not None
+
+        if len(keys) == 0:
+            keys = [entry.key for entry in idb.id0.iterate()]
+
+        print(
+            f"{mode.name}: {memory:,} bytes, "
+            f"{memory / idb.id0.record_count:.0f} bytes/record"
+        )
+
+        def search() -> None:
+            assert idb.id0 is not None
+
+            for key in keys:
+                idb.id0.search(key, key, True, True)
+
+        report(f"{mode.name}: search {len(keys)} keys", search, 50)
+
+
+def benchmark_names() -> None:
+    """
+    Times looking up node names one NetNode at a time and with NetNodeGenerator.names,
+    for the named addresses and for every node of test.i64, in EAGER and FLAT mode.
+    """
+
+    mode: ID0Mode
+    for mode in (ID0Mode.EAGER, ID0Mode.FLAT):
+        with TEST_IDB.open("rb") as file:
+            idb: IDB = IDB(
+                file, sections=SectionFlags.ID0 | SectionFlags.NAM, id0_mode=mode
+            )
+
+        assert idb.id0 is not None and idb.nam is not None
+
+        net_node_generator: NetNodeGenerator = NetNodeGenerator(idb.id0)
+        word_format: str = f">{idb.id0.word_format}"
+
+        node_ids: dict[str, list[int]] = {
+            "named addresses": list(idb.nam.names),
+            "all nodes": sorted(
+                {
+                    unpack_from(word_format, entry.key, 1)[0]
+                    for entry in idb.id0.iterate()
+                    if entry.key.startswith(b".")
+                    and len(entry.key) > idb.id0.word_size + 1
+                }
+            ),
+        }
+
+        name: str
+        for name, ids in node_ids.items():
+
+            def single() -> None:
+                for node_id in ids:
+                    try:
+                        net_node_generator.net_node(node_id).name()
+                    except KeyError:
+                        pass
+
+            def batch() -> None:
+                net_node_generator.names(ids)
+
+            label: str = f"{mode.name}: {len(ids)} {name}"
+            one_by_one: float = report(f"{label}, one at a time", single, 20)
+            merged: float = report(f"{label}, batch", batch, 20)
+
+            print(f"{label}: {one_by_one / merged:.2f}x")
+
+
+def pack_u(value: int) -> bytes:
+    """
+    Packs a value in IDA's variable length U encoding.
+    """
+
+    if value < 0x80:
+        return pack(">B", value)
+    elif value < 0x4000:
+        return pack(">H", value | 0x8000)
+    elif value < 0x20000000:
+        return pack(">I", value | 0xC0000000)
+    else:
+        return b"\xff" + pack(">I", value)
+
+
+def pack_t(value: int) -> bytes:
+    """
+    Packs a value in IDA's variable length T encoding.
+    """
+
+    if value < 0x80:
+        return pack(">B", value)
+    elif value < 0x4000:
+        return pack(">H", value | 0x8000)
+    else:
+        return b"\xff" + pack(">H", value)
+
+
+def pack_v(value: int) -> bytes:
+    return pack_u(value & 0xFFFFFFFF) + pack_u(value >> 32)
+
+
+def benchmark_unpack() -> None:
+    """
+    Times NetNode.unpack decoding 10,000 random $ funcs chunk records, in records per
+    second.
+    """
+
+    with TEST_IDB.open("rb") as file:
+        idb: IDB = IDB(file, sections=SectionFlags.ID0)
+
+    assert idb.id0 is not None and idb.id0.word_size == 8
+
+    net_node: NetNode = NetNodeGenerator(idb.id0).net_node(b"$ funcs")
+
+    random: Random = Random(0)
+    records: list[bytes] = []
+    address: int = 0x140001000
+    for _ in range(10000):
+        size: int = random.randrange(0x10, 0x2000)
+        records.append(
+            pack_v(address)
+            + pack_v(size)
+            + pack_t(random.choice((0x400, 0x4400, 0x5410)))
+            + pack_v(random.randrange(1 << 40))
+            + pack_v(random.randrange(0x400))
+            + pack_t(random.randrange(0x20))
+            + pack_v(random.randrange(0x40))
+        )
+        address += size
+
+    def decode() -> None:
+        offset: int
+        for record in records:
+            _, _, _, offset = net_node.unpack("WWT", record, return_offset=True)
+            net_node.unpack("WWTW", record[offset:])
+
+    best: float = report(f"unpack {len(records)} chunk records", decode, 20)
+
+    print(f"{len(records) / best:,.0f} records/s")
+
+
+def benchmark_strtab() -> None:
+    """
+    Times adding 10,000 to 4,000,000 names, a quarter of them repeats, to an empty
+    string table, in nanoseconds per name.
+    """
+
+    count: int
+    for count in (10000, 100000, 1000000, 4000000):
+        # A quarter of the names are repeats, as with symbols sharing a name.
+        names: list[bytes] = [
+            f"sub_{index % ((count * 3) // 4):x}".encode() for index in range(count)
+        ]
+
+        def intern() -> None:
+            string_table: StringTableSection = StringTableSection(
+                name=b".strtab",
+                type_=SHType.SHT_STRTAB,
+                flags=SHFlags.SHF_ALLOC,
+                address=0,
+                link=0,
+                info=0,
+                alignment=1,
+                entry_size=0,
+            )
+
+            for name in names:
+                string_table.offset_or_append(name)
+
+        best: float = min(repeat(intern, number=1, repeat=3))
+
+        print(
+            f"intern {count:,} names: {best * 1000:.1f} ms, "
+            f"{best * 1e9 / count:.0f} ns/name"
+        )
+
+
+def benchmark_symtab() -> None:
+    """
+    Times encoding a symbol table of 1,000,000 symbols given as SymbolTableEntry objects
+    and given as rows, in nanoseconds per symbol.
+    """
+
+    count: int = 1000000
+
+    entries: list[SymbolTableEntry] = [
+        SymbolTableEntry(
+            name=f"sub_{index:x}".encode(),
+            binding=STBind.STB_LOCAL,
+            type_=STType.STT_FUNC,
+            visibility=STVisibility.STV_DEFAULT,
+            section_index=1,
+            value=index * 0x10,
+            size=0,
+        )
+        for index in range(count)
+    ]
+    entry_rows: list[tuple[bytes, int, int, int, int, int]] = [
+        entry.row() for entry in entries
+    ]
+
+    rows: str
+    for rows in ("entries", "rows"):
+
+        def encode() -> None:
+            string_table: StringTableSection = StringTableSection(
+                name=b".strtab",
+                type_=SHType.SHT_STRTAB,
+                flags=SHFlags.SHF_ALLOC,
+                address=0,
+                link=0,
+                info=0,
+                alignment=1,
+                entry_size=0,
+            )
+            symbol_table: SymbolTableSection = SymbolTableSection(
+                name=b".symtab",
+                type_=SHType.SHT_SYMTAB,
+                flags=SHFlags.SHF_ALLOC,
+                address=0,
+                link=0,
+                info=0,
+                alignment=1,
+                entry_size=0,
+            )
+
+            if rows == "rows":
+                symbol_table.rows = entry_rows
+            else:
+                symbol_table.entries = entries
+
+            symbol_table.to_bytes(8, "Q", "<", string_table)
+
+        best: float = min(repeat(encode, number=1, repeat=3))
+
+        print(
+            f"encode {count:,} symbols from {rows}: {best * 1000:.1f} ms, "
+            f"{best * 1e9 / count:.0f} ns/symbol"
+        )
+
+
+def benchmark_assign() -> None:
+    """
+    Times finding the section of each symbol address by a linear scan, by lookups in
+    the section index and by a merge of sorted addresses, for 100 to 10,000 sections.
+    """
+
+    random: Random = Random(0)
+
+    section_count: int
+    for section_count in (100, 1000, 10000):
+        sections: list[Section] = []
+        address: int = 0x10000000
+        for index in range(section_count):
+            size: int = random.randrange(0x100, 0x10000)
+            sections.append(
+                Section(
+                    f"seg_{index}".encode(),
+                    address,
+                    address + size,
+                    BundleSectionFlags.R,
+                )
+            )
+            address += size + random.choice((0, 0, 0x1000))
+
+        addresses: list[int] = sorted(
+            random.randrange(0x10000000, address) for _ in range(100000)
+        )
+        shuffled: list[int] = random.sample(addresses, len(addresses))
+
+        def linear() -> None:
+            for address_ in shuffled[:1000]:  # All of them would take too long.
+                for section in sections:
+                    if section.start <= address_ < section.end:
+                        break
+
+        def indexed() -> None:
+            sections_by_address = section_indices(sections)
+
+            for address_ in shuffled:
+                sections_by_address.lookup(address_)
+
+        def merged() -> None:
+            section_indices(sections).lookup_many(addresses)
+
+        label: str = f"{section_count:,} sections"
+        scan: float = report(f"{label}, linear scan of 1,000 symbols", linear, 1)
+        lookup: float = report(f"{label}, index 100,000 unsorted symbols", indexed, 1)
+        merge: float = report(f"{label}, index 100,000 sorted symbols", merged, 1)
+
+        print(
+            f"{label}: {scan * 1e9 / 1000:.0f} ns/symbol linear, "
+            f"{lookup * 1e9 / len(addresses):.0f} ns/symbol unsorted, "
+            f"{merge * 1e9 / len(addresses):.0f} ns/symbol sorted"
+        )
+
+
+BENCHMARKS: dict[str, Callable[[], None]] = {
+    "sections": benchmark_sections,
+    "pages": benchmark_pages,
+    "index": benchmark_index,
+    "names": benchmark_names,
+    "unpack": benchmark_unpack,
+    "strtab": benchmark_strtab,
+    "symtab": benchmark_symtab,
+    "assign": benchmark_assign,
+}
+
+if __name__ == "__main__":
+    if len(argv) == 2 and argv[1] in BENCHMARKS:
+        BENCHMARKS[argv[1]]()
+    else:
+        print(f"""Benchmarks: {", ".join(BENCHMARKS)}""")